@@ -0,0 +1,521 @@
+import os
+import random
+from collections import OrderedDict, deque
+from collections.abc import Callable
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from time import perf_counter
+
+from input import Action
+from pieces import Piece, PieceType, Orientation, ORIENTATIONS, ROTATIONS, bag_piece_generator
+from game import Game
+from zobrist import row_key, board_key, combine, position_key
+
+Board = tuple[int, ...]  # rows as bitmasks, top row first
+
+
+# --- Board primitives ---
+def fits(board: Board, width: int, orientation: Orientation, x: int, y: int) -> bool:
+    """Bitmask version of `Field.can_place`."""
+    if x + orientation.min_col < 0 or x + orientation.max_col >= width:
+        return False
+    height = len(board)
+    for row_idx, mask in enumerate(orientation.row_masks):
+        if not mask:
+            continue
+        board_y = y + row_idx
+        if board_y >= height:
+            return False
+        if board_y >= 0 and board[board_y] & (mask << x if x >= 0 else mask >> -x):
+            return False
+    return True
+
+def drop(board: Board, width: int, orientation: Orientation, x: int, y: int) -> int:
+    """Landing row of a piece dropped straight down from (x, y)."""
+    while fits(board, width, orientation, x, y + 1):
+        y += 1
+    return y
+
+def lock(board: Board, width: int, orientation: Orientation, x: int, y: int) -> tuple[Board, int]:
+    """Board after locking the piece at (x, y) and clearing lines, plus the lines cleared."""
+    rows = list(board)
+    for row_idx, mask in enumerate(orientation.row_masks):
+        board_y = y + row_idx
+        if mask and 0 <= board_y < len(rows):
+            rows[board_y] |= mask << x if x >= 0 else mask >> -x
+    full_row = (1 << width) - 1
+    kept = [row for row in rows if row != full_row]
+    lines = len(rows) - len(kept)
+    if lines:
+        kept = [0] * lines + kept
+    return tuple(kept), lines
+
+
+# --- Heuristics ---
+@dataclass(frozen=True, slots=True)
+class Features:
+    aggregate_height: int
+    max_height: int
+    holes: int
+    bumpiness: int
+    lines: int
+
+def board_features(board: Board, width: int, lines: int = 0) -> Features:
+    height = len(board)
+    heights = [0] * width
+    holes = 0
+    seen = 0
+    for y, row in enumerate(board):
+        # empty cells under an already seen block are holes
+        holes += (seen & ~row).bit_count()
+        new = row & ~seen
+        while new:
+            low = new & -new
+            heights[low.bit_length() - 1] = height - y
+            new ^= low
+        seen |= row
+    return Features(
+        aggregate_height = sum(heights),
+        max_height = max(heights),
+        holes = holes,
+        bumpiness = sum(abs(a - b) for a, b in zip(heights, heights[1:])),
+        lines = lines,
+    )
+
+
+@dataclass(frozen=True)
+class Heuristic:
+    """Linear combination of board features, higher is better."""
+    aggregate_height: float = -0.510066
+    max_height: float = 0.0
+    holes: float = -0.35663
+    bumpiness: float = -0.184483
+    lines: float = 0.760666
+
+    def __call__(self, features: Features) -> float:
+        return (
+            self.aggregate_height * features.aggregate_height
+            + self.max_height * features.max_height
+            + self.holes * features.holes
+            + self.bumpiness * features.bumpiness
+            + self.lines * features.lines
+        )
+
+DEFAULT_HEURISTIC = Heuristic()
+
+
+# --- Search ---
+@dataclass(frozen=True, slots=True)
+class Placement:
+    rotation: int
+    x: int
+    y: int
+    rotations: int  # ROTATE presses from the starting position
+    shift: int      # columns to move, negative is left
+    lines: int
+    board: Board    # board after the lock
+    score: float = 0.0
+    key: int = 0    # zobrist.board_key of `board`
+
+    @property
+    def actions(self) -> list[Action]:
+        move = Action.MOVE_LEFT if self.shift < 0 else Action.MOVE_RIGHT
+        return [Action.ROTATE] * self.rotations + [move] * abs(self.shift) + [Action.HARD_DROP]
+
+
+def placements(
+    board: Board, width: int, kind: PieceType, rotation: int, x: int, y: int, key: int | None = None,
+) -> list[Placement]:
+    """
+    Every distinct final placement reachable by rotating (with the `Game.KICK_OFFSETS`
+    kicks), then shifting sideways, then hard dropping. `key` is the
+    `board_key` of `board` when the caller already has it.
+    """
+    if key is None:
+        key = board_key(board)
+    height = len(board)
+    orientations = ORIENTATIONS[kind]
+    result = []
+    seen = set()
+    for rotations in range(ROTATIONS):
+        if rotations:
+            rotated = orientations[(rotation + 1) % ROTATIONS]
+            for dx, dy in Game.KICK_OFFSETS:
+                if fits(board, width, rotated, x + dx, y + dy):
+                    rotation, x, y = (rotation + 1) % ROTATIONS, x + dx, y + dy
+                    break
+            else:
+                break  # rotating is blocked, further presses do nothing
+        orientation = orientations[rotation]
+        for step in (-1, 1):
+            col = x if step < 0 else x + 1
+            while fits(board, width, orientation, col, y):
+                landing = drop(board, width, orientation, col, y)
+                after, lines = lock(board, width, orientation, col, landing)
+                if lines:
+                    after_key = board_key(after)
+                else:
+                    # only the rows the piece landed on changed
+                    after_key = key
+                    for board_y in range(max(landing, 0), min(landing + orientation.height, height)):
+                        after_key ^= row_key(board[board_y], board_y) ^ row_key(after[board_y], board_y)
+                if (after_key, lines) not in seen:
+                    seen.add((after_key, lines))
+                    result.append(Placement(rotation, col, landing, rotations, col - x, lines, after, key=after_key))
+                col += step
+    return result
+
+
+class TranspositionTable[V]:
+    """Bounded LRU map of search results, keyed by 64-bit `zobrist` keys."""
+    def __init__(self, size: int):
+        self.size = size
+        self.entries: OrderedDict[int, V] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: int) -> V | None:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key: int, value: V):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+
+class PlacementSearch:
+    """
+    Picks the best placement for the current piece, optionally looking one
+    piece ahead at `next_piece`, within a per-decision time budget.
+    """
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        heuristic: Callable[[Features], float] = DEFAULT_HEURISTIC,
+        lookahead: bool = True,
+        time_budget: float = 0.05,
+        table_size: int = 100_000,
+    ):
+        self.width = width
+        self.height = height
+        self.heuristic = heuristic
+        self.lookahead = lookahead
+        self.time_budget = time_budget
+        # best_value() and best() results are keyed differently, each gets its own table
+        self.values: TranspositionTable[float] = TranspositionTable(table_size)
+        self.table: TranspositionTable[Placement] = TranspositionTable(table_size)
+
+    def evaluate(self, board: Board, lines: int) -> float:
+        return self.heuristic(board_features(board, self.width, lines))
+
+    def spawn_position(self, kind: PieceType) -> tuple[int, int]:
+        """Same as `Game.get_spawning_pos`."""
+        return (self.width - ORIENTATIONS[kind][0].width) // 2, -2
+
+    def best_value(self, board: Board, kind: PieceType, lines: int = 0, key: int | None = None) -> float:
+        """
+        Score of the best placement of a freshly spawned `kind` piece on `board`.
+        `key` is the `board_key` of `board` when the caller already has it.
+        """
+        if key is None:
+            key = board_key(board)
+        table_key = combine(key, kind.value, lines)
+        cached = self.values.get(table_key)
+        if cached is not None:
+            return cached
+        x, y = self.spawn_position(kind)
+        if not fits(board, self.width, ORIENTATIONS[kind][0], x, y + 1):
+            value = float('-inf')  # game over
+        else:
+            value = max(
+                (self.evaluate(p.board, lines + p.lines) for p in placements(board, self.width, kind, 0, x, y, key)),
+                default=float('-inf'),
+            )
+        self.values.put(table_key, value)
+        return value
+
+    def best(
+        self, board: Board, piece: Piece, next_piece: Piece | None = None, key: int | None = None,
+    ) -> Placement | None:
+        """Best placement of `piece`. Pass `key`, the `board_key` of `board`, when known (`Field.board_key`)."""
+        if key is None:
+            key = board_key(board)
+        table_key = position_key(key, piece, next_piece)
+        cached = self.table.get(table_key)
+        if cached is not None:
+            return cached
+
+        deadline = perf_counter() + self.time_budget
+        candidates = sorted(
+            (
+                Placement(
+                    p.rotation, p.x, p.y, p.rotations, p.shift, p.lines, p.board,
+                    self.evaluate(p.board, p.lines), p.key,
+                )
+                for p in placements(board, self.width, piece.kind, piece.rotation, piece.x, piece.y, key)
+            ),
+            key=lambda p: p.score,
+            reverse=True,
+        )
+        if not candidates:
+            return None
+
+        best = candidates[0]
+        if self.lookahead and next_piece:
+            # refine the most promising candidates first until the budget runs out
+            deepened: list[tuple[float, Placement]] = []
+            for candidate in candidates:
+                if deepened and perf_counter() > deadline:
+                    break
+                score = self.best_value(candidate.board, next_piece.kind, candidate.lines, candidate.key)
+                deepened.append((score, candidate))
+            score, candidate = max(deepened, key=lambda entry: entry[0])
+            best = Placement(
+                candidate.rotation, candidate.x, candidate.y, candidate.rotations,
+                candidate.shift, candidate.lines, candidate.board, score, candidate.key,
+            )
+            if len(deepened) < len(candidates):
+                return best  # partial search, don't cache
+
+        self.table.put(table_key, best)
+        return best
+
+
+# --- Monte-Carlo rollouts ---
+LOSS_VALUE = -1000.0  # outcome of a rollout that topped out
+
+Rollout = tuple[float, int | None, PieceType | None, float]  # after_first is a board_key
+
+def _stats_key(key: int, kind: PieceType | None) -> int:
+    """Monte-Carlo statistics key of a board key and the piece to play on it."""
+    return combine(key, kind.value if kind else 0)
+
+@dataclass(slots=True)
+class Samples:
+    """Running total of the rollout outcomes recorded for one `_stats_key`."""
+    total: float = 0.0
+    count: int = 0
+
+_greedy_searches: dict[tuple, PlacementSearch] = {}  # per process, reused by every rollout
+
+def _greedy_search(width: int, height: int, heuristic: Callable[[Features], float]) -> PlacementSearch:
+    key = (width, height, heuristic)
+    search = _greedy_searches.get(key)
+    if search is None:
+        search = _greedy_searches[key] = PlacementSearch(width, height, heuristic, lookahead=False)
+    return search
+
+def rollout(
+    width: int,
+    height: int,
+    heuristic: Callable[[Features], float],
+    depth: int,
+    board: Board,
+    kind: PieceType | None,
+    seed: int,
+) -> Rollout:
+    """
+    Play `depth` pieces greedily from `board`: `kind` first (drawn like the rest
+    when None), then pieces dealt from a seeded bag. Returns the outcome plus,
+    for crediting the position one piece later, the key of the board after the
+    first piece, the piece that follows it and the outcome from there on.
+    """
+    search = _greedy_search(width, height, heuristic)
+    key = board_key(board)
+    pieces = bag_piece_generator(seed)
+    kinds = ([kind] if kind else []) + pieces.peek(depth if kind is None else depth - 1)
+
+    lines = first_lines = 0
+    after_first = None
+    for i, piece_kind in enumerate(kinds):
+        x, y = search.spawn_position(piece_kind)
+        placement = None
+        if fits(board, width, ORIENTATIONS[piece_kind][0], x, y + 1):
+            placement = search.best(board, Piece(piece_kind, x, y), key=key)
+        if placement is None:
+            if after_first is None:
+                return LOSS_VALUE, None, None, LOSS_VALUE
+            return LOSS_VALUE, after_first, kinds[1], LOSS_VALUE
+        board, key = placement.board, placement.key
+        lines += placement.lines
+        if i == 0:
+            after_first, first_lines = key, placement.lines
+    value = search.evaluate(board, lines)
+    if len(kinds) < 2:
+        return value, None, None, value
+    return value, after_first, kinds[1], search.evaluate(board, lines - first_lines)
+
+def rollout_batch(width, height, heuristic, depth, board, kind, seeds) -> list[Rollout]:
+    return [rollout(width, height, heuristic, depth, board, kind, seed) for seed in seeds]
+
+
+class MonteCarloSearch:
+    """
+    Ranks the placements of the current piece by the average outcome of
+    random rollouts: the known next piece and `depth - 1` pieces from seeded
+    bags, all placed greedily. The top `candidates` placements (by one-ply
+    score) share the rollouts round-robin until `time_budget` runs out.
+    Rollouts run on a process pool, or inline with `workers=0`.
+
+    Outcomes are kept per (board key, next piece). Every rollout is also credited
+    to the position one piece later, so when the game reaches a position a
+    rollout predicted, board and next piece included, its samples are reused.
+    Same `best()` interface as `PlacementSearch`, so it plugs into `Bot`.
+    """
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        heuristic: Callable[[Features], float] = DEFAULT_HEURISTIC,
+        time_budget: float = 0.2,
+        depth: int = 5,
+        candidates: int = 8,
+        batch_size: int = 4,
+        workers: int | None = None,
+        table_size: int = 100_000,
+        seed: int | None = None,
+    ):
+        self.width = width
+        self.height = height
+        self.heuristic = heuristic
+        self.time_budget = time_budget
+        self.depth = depth
+        self.candidates = candidates
+        self.batch_size = batch_size
+        self.workers = workers
+        self.greedy = PlacementSearch(width, height, heuristic, lookahead=False)
+        self.stats: TranspositionTable[Samples] = TranspositionTable(table_size)  # by _stats_key(board, next kind)
+        self.rng = random.Random(seed)
+        self.executor: Executor | None = ProcessPoolExecutor(workers) if workers != 0 else None
+        self.max_in_flight = (workers or os.cpu_count() or 1) + 1  # batches handed to the pool at once
+        self._pending: dict[Future, int] = {}  # -> stats key
+        if self.executor:
+            # start the worker processes now rather than during the first move
+            wait([self.executor.submit(rollout_batch, width, height, heuristic, depth, (), None, [])
+                  for _ in range(self.max_in_flight - 1)])
+        self.rollouts = 0
+        self.reused = 0  # samples found in the table when a move started
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown(cancel_futures=True)
+            self._pending.clear()
+
+    def __enter__(self) -> 'MonteCarloSearch':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _record(self, key: int, value: float):
+        entry = self.stats.get(key)
+        if entry is None:
+            self.stats.put(key, Samples(value, 1))
+        else:
+            entry.total += value
+            entry.count += 1
+
+    def _record_batch(self, key: int, results: list[Rollout]):
+        for value, sub_key, sub_kind, sub_value in results:
+            self._record(key, value)
+            if sub_key is not None:
+                self._record(_stats_key(sub_key, sub_kind), sub_value)
+        self.rollouts += len(results)
+
+    def _collect(self, done):
+        for future in done:
+            key = self._pending.pop(future)
+            if not future.cancelled():
+                self._record_batch(key, future.result())
+
+    def _submit(self, key: int, board: Board, kind: PieceType | None):
+        seeds = [self.rng.getrandbits(32) for _ in range(self.batch_size)]
+        args = (self.width, self.height, self.heuristic, self.depth, board, kind, seeds)
+        if self.executor is None:
+            self._record_batch(key, rollout_batch(*args))
+            return None
+        return self.executor.submit(rollout_batch, *args)
+
+    def best(
+        self, board: Board, piece: Piece, next_piece: Piece | None = None, key: int | None = None,
+    ) -> Placement | None:
+        deadline = perf_counter() + self.time_budget
+        candidates = sorted(
+            placements(board, self.width, piece.kind, piece.rotation, piece.x, piece.y, key),
+            key=lambda p: self.evaluate(p),
+            reverse=True,
+        )[:self.candidates]
+        if not candidates:
+            return None
+        next_kind = next_piece.kind if next_piece else None
+        keys = [_stats_key(candidate.key, next_kind) for candidate in candidates]
+        boards = {key: candidate.board for key, candidate in zip(keys, candidates)}
+        counts = lambda key: (self.stats.get(key) or Samples()).count
+        self.reused += sum(counts(key) for key in keys)
+
+        # hand out rollout batches to the least sampled candidate first. Batches
+        # still running at the deadline are kept and recorded on a later move.
+        pending = self._pending
+        queued = lambda key: sum(pending_key == key for pending_key in pending.values())
+        while True:
+            self._collect(wait(pending, timeout=0)[0])
+            remaining = deadline - perf_counter()
+            if remaining <= 0:
+                break
+            while len(pending) < self.max_in_flight:
+                key = min(keys, key=lambda key: counts(key) + queued(key))
+                future = self._submit(key, boards[key], next_kind)
+                if future is None:
+                    break
+                pending[future] = key
+            if pending:
+                wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+
+        def score(index: int) -> float:
+            candidate = candidates[index]
+            entry = self.stats.get(keys[index])
+            if entry is None:
+                return self.evaluate(candidate)
+            # rollout outcomes start counting lines after this placement
+            line_bonus = self.greedy.evaluate(candidate.board, candidate.lines) - self.greedy.evaluate(candidate.board, 0)
+            return entry.total / entry.count + line_bonus
+
+        # rollout averages and one-ply scores are not comparable, prefer the former
+        sampled = [index for index, key in enumerate(keys) if counts(key)]
+        best_index = max(sampled or range(len(candidates)), key=score)
+        best = candidates[best_index]
+        return Placement(
+            best.rotation, best.x, best.y, best.rotations, best.shift, best.lines, best.board,
+            score(best_index), best.key,
+        )
+
+    def evaluate(self, placement: Placement) -> float:
+        return self.greedy.evaluate(placement.board, placement.lines)
+
+
+class Bot:
+    """Plays a `Game` through `PlacementSearch`, one `Action` per call like `Input.get_action`."""
+    def __init__(self, search: PlacementSearch | MonteCarloSearch):
+        self.search = search
+        self._plan: deque[Action] = deque()
+        self._planned_for: Piece | None = None
+
+    def get_action(self, game: Game) -> Action | None:
+        if not game.is_running or not game.current_piece:
+            return None
+        # next_piece is replaced on every spawn, current_piece also on every rotation
+        if game.next_piece is not self._planned_for:
+            self._planned_for = game.next_piece
+            placement = self.search.best(
+                game.field.row_masks, game.current_piece, game.next_piece, game.field.board_key,
+            )
+            self._plan = deque(placement.actions if placement else [Action.HARD_DROP])
+        return self._plan.popleft() if self._plan else None
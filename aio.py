@@ -0,0 +1,135 @@
+import argparse
+import asyncio
+import os
+import sys
+from time import perf_counter
+
+from input import Action, Input, KeyDecoder
+from pieces import bag_piece_generator
+from field import BitboardField
+from game import Game
+from renderer import Renderer, DiffRenderer
+from animation import GameAnimator
+from spectate import SpectatorFeed, serve_feed
+
+GAME_FIELD_WIDTH = 10
+GAME_FIELD_HEIGHT = 20
+
+
+class AsyncInput:
+    """Decodes key input into a queue holding every `Action` in arrival order."""
+    def __init__(self):
+        self.decoder = KeyDecoder()
+        self.queue: asyncio.Queue[Action] = asyncio.Queue()
+
+    def feed(self, data: str):
+        for action in self.decoder.feed(data):
+            self.queue.put_nowait(action)
+
+    async def get_action(self, timeout: float) -> Action | None:
+        """Wait up to `timeout` seconds for the next action."""
+        if not self.queue.empty():
+            return self.queue.get_nowait()
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except TimeoutError:
+            return None
+
+
+class TerminalInput(AsyncInput):
+    """Reads the local terminal through `loop.add_reader`, no polling."""
+    READ_SIZE = 1024
+
+    def __init__(self):
+        super().__init__()
+        self.terminal = Input()  # cbreak mode, restored at exit
+        self.fd = sys.stdin.fileno()
+        asyncio.get_running_loop().add_reader(self.fd, self._on_readable)
+
+    def _on_readable(self):
+        self.feed(os.read(self.fd, self.READ_SIZE).decode(errors='ignore'))
+
+    def close(self):
+        asyncio.get_running_loop().remove_reader(self.fd)
+        self.terminal.restore()
+
+
+class StreamInput(AsyncInput):
+    """Reads keys from an `asyncio.StreamReader`, e.g. a socket connection."""
+    READ_SIZE = 1024
+
+    def __init__(self, reader: asyncio.StreamReader):
+        super().__init__()
+        self.reader = reader
+        self.closed = asyncio.Event()
+
+    async def pump(self):
+        """Feed the stream into the queue until it hits EOF."""
+        try:
+            while data := await self.reader.read(self.READ_SIZE):
+                self.feed(data.decode('latin-1'))
+        finally:
+            self.closed.set()
+
+
+async def run_session(
+    game: Game,
+    renderer: Renderer,
+    keys: AsyncInput,
+    redraw_interval: float = 0.1,
+    feed: SpectatorFeed | None = None,
+):
+    """
+    Drive `game` until it is over and its game-over animation has played. The
+    loop sleeps until either input arrives, the next gravity step / state
+    timer is due or the next animation frame is, redrawing at least every
+    `redraw_interval` seconds so the clock keeps ticking. Every frame of the
+    game is also published to `feed` when given.
+    """
+    animator = GameAnimator(game, renderer)
+    last = perf_counter()
+    snapshot = None
+    while not animator.finished:
+        if game.is_game_over:
+            await asyncio.sleep(animator.next_frame_in())
+        else:
+            timeout = min(game.time_to_next_update, redraw_interval, animator.next_frame_in())
+            action = await keys.get_action(timeout)
+
+            now = perf_counter()
+            game.process(now - last, action)
+            last = now
+            # apply everything else that queued up during this wakeup
+            while not keys.queue.empty() and not game.is_game_over:
+                game.process(0.0, keys.queue.get_nowait())
+            snapshot = game.snapshot
+            if feed:
+                feed.publish(snapshot)
+                if game.is_game_over:
+                    feed.end()
+
+        animator.draw(snapshot)
+
+
+async def main(args):
+    feed = spectators = None
+    if args.spectate_port or args.spectate_unix:
+        feed = SpectatorFeed()
+        spectators = await serve_feed(feed, port=args.spectate_port, unix=args.spectate_unix)
+    keys = TerminalInput()
+    game = Game(BitboardField(GAME_FIELD_WIDTH, GAME_FIELD_HEIGHT), bag_piece_generator)
+    renderer = DiffRenderer(GAME_FIELD_WIDTH, GAME_FIELD_HEIGHT)
+    game.start()
+    try:
+        await run_session(game, renderer, keys, feed=feed)
+    finally:
+        keys.close()
+        if spectators:
+            spectators.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Play Tetris in the terminal on an asyncio event loop.")
+    parser.add_argument('--spectate-port', type=int, help="publish the game to watchers on this TCP port (see spectate.py)")
+    parser.add_argument('--spectate-unix', help="publish the game to watchers on a Unix socket at this path")
+    asyncio.run(main(parser.parse_args()))
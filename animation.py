@@ -0,0 +1,157 @@
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+from time import perf_counter
+
+from game import Game
+from renderer import Renderer
+from snapshot import GameSnapshot
+
+Row = tuple[str, ...]        # one string per cell
+Delta = tuple[tuple[int, Row], ...]  # (field row, new cells) of every row a frame changes
+
+
+@dataclass(frozen=True, slots=True)
+class Animation:
+    """
+    Precomputed field effect: the cells shown when it starts, then one delta
+    per frame, `frame_time` apart. The sidebar shows `snapshot` throughout.
+    """
+    start: tuple[Row, ...]
+    frames: tuple[Delta, ...]
+    frame_time: float
+    snapshot: GameSnapshot | None = None
+
+    @property
+    def duration(self) -> float:
+        return len(self.frames) * self.frame_time
+
+
+def game_over_animation(renderer: Renderer, snapshot: GameSnapshot, frame_time: float = 0.05) -> Animation:
+    """Fill the field with '#' from the bottom up, then restore it from the top down."""
+    start = tuple(renderer.field_cells(snapshot.field.grid))
+    height = len(start)
+    filled = ('#',) * renderer.width
+    fill = tuple(((y, filled),) for y in reversed(range(height)))
+    empty = tuple(((y, start[y]),) for y in range(height))
+    return Animation(start, fill + empty, frame_time, snapshot)
+
+
+def message_animation(renderer: Renderer, text: str, duration: float, snapshot: GameSnapshot | None = None) -> Animation:
+    """Show `text` in an empty field for `duration` seconds."""
+    return Animation(tuple(renderer.message_cells(text)), ((),), duration, snapshot)
+
+
+class Timeline:
+    """
+    Plays animations one after another through a renderer without blocking:
+    the frame loop calls `advance()` once per frame. Frames that came due
+    since the last call are merged, and only when rows changed is the
+    field drawn, so a `DiffRenderer` emits just those rows.
+    """
+    def __init__(self, renderer: Renderer, clock: Callable[[], float] = perf_counter):
+        self.renderer = renderer
+        self.clock = clock
+        self.queue: deque[Animation] = deque()
+        self.current: Animation | None = None
+        self._started = 0.0
+        self._frame = 0  # next frame to apply
+        self._rows: list[Row] = []
+        self._text: list[str] = []
+        self._changed = False
+
+    @property
+    def active(self) -> bool:
+        return self.current is not None
+
+    def play(self, animation: Animation):
+        """Queue `animation`, it starts right away if nothing is playing."""
+        self.queue.append(animation)
+        if self.current is None:
+            self._start_next()
+
+    def cancel(self):
+        self.queue.clear()
+        self.current = None
+
+    def next_frame_in(self) -> float:
+        """Seconds until `advance()` has something to do."""
+        if self.current is None:
+            return float('inf')
+        due = self._started + self._frame * self.current.frame_time
+        return max(0.0, due - self.clock())
+
+    def advance(self) -> bool:
+        """Apply the frames that are due and draw them, return whether an animation is playing."""
+        animation = self.current
+        if animation is None:
+            return False
+        elapsed = self.clock() - self._started
+        if animation.frame_time > 0:
+            due = min(int(elapsed / animation.frame_time) + 1, len(animation.frames))
+        else:
+            due = len(animation.frames)
+        rows, text = self._rows, self._text
+        while self._frame < due:
+            for y, cells in animation.frames[self._frame]:
+                rows[y] = cells
+                text[y] = ''.join(cells)
+                self._changed = True
+            self._frame += 1
+        if self._changed:
+            self._changed = False
+            self.renderer.draw_field(rows, animation.snapshot, text)
+        if elapsed >= animation.duration:
+            self._start_next()
+        return self.current is not None
+
+    def _start_next(self):
+        self.current = self.queue.popleft() if self.queue else None
+        if self.current is not None:
+            self._started = self.clock()
+            self._frame = 0
+            self._rows = list(self.current.start)
+            self._text = [''.join(cells) for cells in self._rows]
+            self._changed = True
+
+
+class GameAnimator:
+    """
+    Draws a game once per frame: the game itself, or its level-up and
+    game-over animations on a `Timeline` while they play. `finished` turns
+    True once the game is over and its animation has played.
+    """
+    GAME_OVER_FRAME_TIME = 0.05
+    MIN_MESSAGE_TIME = 0.05  # the level-up timer may already be over when a frame stalls
+
+    def __init__(self, game: Game, renderer: Renderer, clock: Callable[[], float] = perf_counter):
+        self.game = game
+        self.renderer = renderer
+        self.timeline = Timeline(renderer, clock)
+        self._level_shown = game.level
+        self._game_over_shown = False
+
+    @property
+    def finished(self) -> bool:
+        return self._game_over_shown and not self.timeline.active
+
+    def next_frame_in(self) -> float:
+        return self.timeline.next_frame_in()
+
+    def draw(self, snapshot: GameSnapshot | None = None):
+        """Draw one frame, `snapshot` is the game's current one when the caller already took it."""
+        game, renderer = self.game, self.renderer
+        if game.is_game_over and not self._game_over_shown:
+            self._game_over_shown = True
+            self.timeline.cancel()
+            self.timeline.play(game_over_animation(renderer, snapshot or game.snapshot, self.GAME_OVER_FRAME_TIME))
+        elif game.is_leveling_up and game.level != self._level_shown:
+            self._level_shown = game.level
+            self.timeline.play(message_animation(
+                renderer, f"LEVEL {game.level}!", max(game.time_to_next_update, self.MIN_MESSAGE_TIME),
+                snapshot or game.snapshot,
+            ))
+        if self.timeline.advance():
+            return
+        if game.is_running:
+            renderer.draw(snapshot or game.snapshot)
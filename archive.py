@@ -0,0 +1,233 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+from collections.abc import Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+
+from field import BaseField, BitboardField
+from replay import Recorder, Replay
+
+MAGIC = b'TARC'
+VERSION = 1
+
+# magic, version, game count, offset of the index
+_HEADER = struct.Struct('<4sB3xQQ')
+# offset and size of the replay, then its score, lines, level, pieces drawn and ticks
+_ENTRY = struct.Struct('<QIQIIII')
+
+
+@dataclass(frozen=True, slots=True)
+class ArchiveEntry:
+    index: int
+    offset: int
+    size: int
+    score: int
+    lines: int
+    level: int
+    pieces: int
+    ticks: int
+
+
+class ArchiveWriter:
+    """
+    Writes many replays (the `replay` format) into one archive file:
+    a fixed-size header, the replays back to back, then an index of
+    fixed-size entries holding each replay's offset and final results.
+    The header is completed on `close()`.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.file.write(_HEADER.pack(MAGIC, VERSION, 0, 0))
+        self.offset = _HEADER.size
+        self.index = bytearray()
+        self.count = 0
+
+    def add(self, replay: bytes | Recorder) -> int:
+        """Append a replay (bytes or a finished `Recorder`) and return its index."""
+        data = replay.to_bytes() if isinstance(replay, Recorder) else replay
+        parsed = Replay(data)
+        if parsed.final is None:
+            raise ValueError("replay has no final results")
+        score, lines, level = parsed.final
+        self.index.extend(_ENTRY.pack(self.offset, len(data), score, lines, level, len(parsed.pieces), len(parsed.dts)))
+        self.file.write(data)
+        self.offset += len(data)
+        self.count += 1
+        return self.count - 1
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.file.write(self.index)
+        self.file.seek(0)
+        self.file.write(_HEADER.pack(MAGIC, VERSION, self.count, self.offset))
+        self.file.close()
+
+    def __enter__(self) -> 'ArchiveWriter':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Archive:
+    """
+    Read-only view of an archive through `mmap`. Opening it only reads the
+    header; entries and replays are read on demand, so scanning the index or
+    a range of games never touches the rest of the file.
+    """
+    def __init__(self, path: str, field_factory: Callable[[int, int], BaseField] = BitboardField):
+        self.path = path
+        self.field_factory = field_factory
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count, self._index_offset = _HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError("not a game archive")
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _range(self, start: int, stop: int | None) -> range:
+        return range(*slice(start, stop).indices(self.count))
+
+    def entry(self, index: int) -> ArchiveEntry:
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return ArchiveEntry(index, *_ENTRY.unpack_from(self._map, self._index_offset + index * _ENTRY.size))
+
+    def entries(self, start: int = 0, stop: int | None = None) -> Iterator[ArchiveEntry]:
+        """Index entries of games `start` to `stop`, without reading the replays."""
+        indices = self._range(start, stop)
+        if not indices:
+            return
+        first = self._index_offset + indices.start * _ENTRY.size
+        view = memoryview(self._map)[first:first + len(indices) * _ENTRY.size]
+        try:
+            for index, fields in zip(indices, _ENTRY.iter_unpack(view)):
+                yield ArchiveEntry(index, *fields)
+        finally:
+            view.release()
+
+    def data(self, index: int) -> bytes:
+        entry = self.entry(index)
+        return self._map[entry.offset:entry.offset + entry.size]
+
+    def replay(self, index: int) -> Replay:
+        return Replay(self.data(index), self.field_factory)
+
+    def games(
+        self,
+        start: int = 0,
+        stop: int | None = None,
+        where: Callable[[ArchiveEntry], bool] | None = None,
+    ) -> Iterator[tuple[ArchiveEntry, Replay]]:
+        """
+        Lazily yield (entry, replay) for games `start` to `stop`. `where`
+        filters on the index first, so skipped games are never parsed.
+        """
+        for entry in self.entries(start, stop):
+            if where is None or where(entry):
+                data = self._map[entry.offset:entry.offset + entry.size]
+                yield entry, Replay(data, self.field_factory)
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self) -> 'Archive':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def resimulate_range(path: str, start: int, stop: int) -> list[dict]:
+    """Replay games `start` to `stop` of the archive headlessly and compare with the index."""
+    rows = []
+    with Archive(path) as archive:
+        for entry, replay in archive.games(start, stop):
+            game = replay.play()
+            rows.append({
+                'index': entry.index,
+                'score': game.score,
+                'lines': game.cleared_lines,
+                'level': game.level,
+                'ok': (game.score, game.cleared_lines, game.level) == (entry.score, entry.lines, entry.level),
+            })
+    return rows
+
+
+def resimulate(
+    path: str,
+    start: int = 0,
+    stop: int | None = None,
+    workers: int | None = None,
+    chunk: int = 256,
+) -> Iterator[dict]:
+    """
+    Yield result rows for games `start` to `stop`, in order, re-simulated on a
+    process pool. Every worker maps the archive itself and gets ranges of
+    `chunk` games, so only their offsets cross the process boundary.
+    """
+    with Archive(path) as archive:
+        indices = archive._range(start, stop)
+    starts = range(indices.start, indices.stop, chunk)
+    stops = [min(first + chunk, indices.stop) for first in starts]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for rows in executor.map(partial(resimulate_range, path), starts, stops):
+            yield from rows
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Pack, inspect and re-simulate archives of recorded games.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    pack = commands.add_parser('pack', help="pack replay files into an archive")
+    pack.add_argument('archive')
+    pack.add_argument('replays', nargs='+')
+    info = commands.add_parser('info', help="summarize the index")
+    info.add_argument('archive')
+    verify = commands.add_parser('verify', help="re-simulate games and check their results")
+    verify.add_argument('archive')
+    verify.add_argument('--start', type=int, default=0)
+    verify.add_argument('--stop', type=int)
+    verify.add_argument('--workers', type=int, default=os.cpu_count())
+    verify.add_argument('--chunk', type=int, default=256)
+    args = parser.parse_args(argv)
+
+    if args.command == 'pack':
+        with ArchiveWriter(args.archive) as writer:
+            for path in args.replays:
+                with open(path, 'rb') as f:
+                    writer.add(f.read())
+        print(f"{writer.count} games packed into {args.archive}", file=sys.stderr)
+    elif args.command == 'info':
+        with Archive(args.archive) as archive:
+            games = total_score = total_lines = best = 0
+            for entry in archive.entries():
+                games += 1
+                total_score += entry.score
+                total_lines += entry.lines
+                best = max(best, entry.score)
+        if games:
+            print(f"{games} games, mean score {total_score / games:.1f}, mean lines {total_lines / games:.1f}, best score {best}")
+        else:
+            print("empty archive")
+    else:
+        checked = mismatched = 0
+        for row in resimulate(args.archive, args.start, args.stop, args.workers, args.chunk):
+            checked += 1
+            if not row['ok']:
+                mismatched += 1
+                print(f"game {row['index']} replays to score {row['score']}, lines {row['lines']}, level {row['level']}")
+        print(f"{checked} games re-simulated, {mismatched} mismatched", file=sys.stderr)
+        sys.exit(1 if mismatched else 0)
+
+
+if __name__ == '__main__':
+    main()
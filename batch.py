@@ -0,0 +1,295 @@
+from collections.abc import Callable, Iterator, Sequence
+from time import perf_counter
+
+import numpy as np
+
+from input import Action
+from pieces import Piece, PieceType, ORIENTATIONS, ROTATIONS
+from game import Game, GameState
+
+NO_ACTION = 0
+NO_STATE = 0
+MAX_PIECE_ROWS = max(o.height for orientations in ORIENTATIONS.values() for o in orientations)
+CELLS_PER_PIECE = 4
+
+# Orientation tables indexed by [PieceType.value, rotation]; index 0 is unused
+_KINDS = len(PieceType) + 1
+ROW_MASKS = np.zeros((_KINDS, ROTATIONS, MAX_PIECE_ROWS), dtype=np.uint64)
+CELLS_X = np.zeros((_KINDS, ROTATIONS, CELLS_PER_PIECE), dtype=np.int64)
+CELLS_Y = np.zeros((_KINDS, ROTATIONS, CELLS_PER_PIECE), dtype=np.int64)
+MIN_COL = np.zeros((_KINDS, ROTATIONS), dtype=np.int64)
+MAX_COL = np.zeros((_KINDS, ROTATIONS), dtype=np.int64)
+WIDTHS = np.zeros((_KINDS, ROTATIONS), dtype=np.int64)
+for _kind, _orientations in ORIENTATIONS.items():
+    for _rotation, _o in enumerate(_orientations):
+        ROW_MASKS[_kind.value, _rotation, :_o.height] = _o.row_masks
+        CELLS_X[_kind.value, _rotation] = [c for c, _ in _o.cells]
+        CELLS_Y[_kind.value, _rotation] = [r for _, r in _o.cells]
+        MIN_COL[_kind.value, _rotation] = _o.min_col
+        MAX_COL[_kind.value, _rotation] = _o.max_col
+        WIDTHS[_kind.value, _rotation] = _o.width
+
+
+def encode_actions(actions: Sequence[Action | None]) -> np.ndarray:
+    """Turn a per-game list of actions into the code array `BatchGame.process` takes."""
+    return np.array([action.value if action else NO_ACTION for action in actions], dtype=np.int8)
+
+
+class BatchGame:
+    """
+    Advances N independent games in lockstep with the same rules as `Game`.
+    Boards are an (N, height) uint64 row-bitmask array plus an (N, height, width)
+    uint8 color plane; every rule step is an array operation over the batch.
+    """
+    MIN_GRAVITY = Game.MIN_GRAVITY
+    MAX_GRAVITY = Game.MAX_GRAVITY
+    GRAVITY_STEP = Game.GRAVITY_STEP
+    LEVEL_UP_EVERY_X_LINES = Game.LEVEL_UP_EVERY_X_LINES
+    KICK_OFFSETS = Game.KICK_OFFSETS
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        piece_generators: Sequence[Callable[[], Iterator[Piece]]],
+        clock: Callable[[], float] = perf_counter,
+    ):
+        if width > 64:
+            raise ValueError("BatchGame supports boards up to 64 columns wide")
+        n = len(piece_generators)
+        self.n = n
+        self.width = width
+        self.height = height
+        self.full_row = np.uint64((1 << width) - 1)
+        self.clock = clock
+        self.piece_gens: list[Iterator[Piece]] = [piece_generator() for piece_generator in piece_generators]
+
+        self.board = np.zeros((n, height), dtype=np.uint64)
+        self.colors = np.zeros((n, height, width), dtype=np.uint8)
+        self.kind = np.zeros(n, dtype=np.int64)
+        self.rotation = np.zeros(n, dtype=np.int64)
+        self.x = np.zeros(n, dtype=np.int64)
+        self.y = np.zeros(n, dtype=np.int64)
+        self.next_kind = np.zeros(n, dtype=np.int64)
+
+        self.state = np.full(n, GameState.RUNNING.value, dtype=np.int8)
+        self.prev_state = np.full(n, NO_STATE, dtype=np.int8)
+        self.next_state_timer = np.zeros(n, dtype=np.float64)
+        self.physics_acc = np.zeros(n, dtype=np.float64)
+
+        self.game_started_at: float = self.clock()
+        self.score = np.zeros(n, dtype=np.int64)
+        self.cleared_lines = np.zeros(n, dtype=np.int64)
+        self.level = np.ones(n, dtype=np.int64)
+        self.pieces_placed = np.zeros(n, dtype=np.int64)
+
+    @property
+    def is_running(self) -> np.ndarray:
+        return self.state == GameState.RUNNING.value
+
+    @property
+    def is_leveling_up(self) -> np.ndarray:
+        return self.state == GameState.LEVEL_UP.value
+
+    @property
+    def is_game_over(self) -> np.ndarray:
+        return self.state == GameState.GAME_OVER.value
+
+    @property
+    def physics_interval(self) -> np.ndarray:
+        return np.maximum(self.MIN_GRAVITY, self.MAX_GRAVITY - (self.level - 1) * self.GRAVITY_STEP)
+
+    @property
+    def playtime(self) -> float:
+        return self.clock() - self.game_started_at
+
+    def grid(self, i: int) -> list[list[int]]:
+        """Color grid of game `i`, same layout as `Field.snapshot.grid`."""
+        return self.colors[i].tolist()
+
+    def start(self):
+        self._spawn(np.arange(self.n))
+
+    def restart(self, idx: np.ndarray):
+        """Start games `idx` over in place; reset their piece generators first."""
+        self.board[idx] = 0
+        self.colors[idx] = 0
+        self.next_kind[idx] = 0
+        self.state[idx] = GameState.RUNNING.value
+        self.prev_state[idx] = NO_STATE
+        self.next_state_timer[idx] = 0.0
+        self.physics_acc[idx] = 0.0
+        self.score[idx] = 0
+        self.cleared_lines[idx] = 0
+        self.level[idx] = 1
+        self.pieces_placed[idx] = 0
+        self._spawn(idx)
+
+    def process(self, dt: float, actions: np.ndarray | None = None):
+        """Advance every game by `dt`; `actions` holds one `Action.value` (or 0) per game."""
+        self._process_state_transitions()
+        if actions is not None:
+            self._process_actions(np.asarray(actions))
+        self._process_physics(dt)
+
+    # --- Rules ---
+    def _fits(self, idx, kind, rotation, x, y) -> np.ndarray:
+        """Vectorized `Field.can_place` for games `idx`."""
+        fits = (x + MIN_COL[kind, rotation] >= 0) & (x + MAX_COL[kind, rotation] < self.width)
+        if not len(idx):
+            return fits
+        # np.minimum/np.maximum instead of np.clip, which costs more than the
+        # arithmetic on batches this small
+        left = np.minimum(np.maximum(x, 0), 63).astype(np.uint64)
+        right = np.minimum(np.maximum(-x, 0), 63).astype(np.uint64)
+        last_row = self.height - 1
+        for row_idx in range(MAX_PIECE_ROWS):
+            mask = ROW_MASKS[kind, rotation, row_idx]
+            occupied = mask != 0
+            mask = (mask << left) >> right
+            board_y = y + row_idx
+            fits &= ~(occupied & (board_y > last_row))
+            on_board = occupied & (board_y >= 0) & (board_y <= last_row)
+            rows = self.board[idx, np.minimum(np.maximum(board_y, 0), last_row)]
+            fits &= ~(on_board & ((rows & mask) != 0))
+        return fits
+
+    def _try_move(self, idx, dx: int = 0, dy=0) -> np.ndarray:
+        """Move games `idx` by (dx, dy) where possible, return which moved."""
+        fits = self._fits(idx, self.kind[idx], self.rotation[idx], self.x[idx] + dx, self.y[idx] + dy)
+        moved = idx[fits]
+        self.x[moved] += dx
+        self.y[moved] += dy if np.isscalar(dy) else dy[fits]
+        return fits
+
+    def _change_state(self, idx, new_state: GameState, timer: float = 0.0):
+        idx = idx[self.state[idx] != new_state.value]
+        self.next_state_timer[idx] = self.clock() + timer if timer else 0.0
+        self.prev_state[idx] = self.state[idx]
+        self.state[idx] = new_state.value
+
+    def _process_state_transitions(self):
+        timer = self.next_state_timer
+        idx = np.flatnonzero((timer != 0.0) & (timer <= self.clock()))
+        for state in np.unique(self.prev_state[idx]):
+            self._change_state(idx[self.prev_state[idx] == state], GameState(int(state)))
+
+    def _ghost_y(self, idx) -> np.ndarray:
+        y = self.y[idx]
+        if not len(idx):
+            return y.copy()
+        # test every drop distance at once; the first that does not fit is one
+        # past the landing row, and the floor guarantees there is one
+        drops = np.arange(1, self.height - int(y.min()) + 1)
+        n, m = len(idx), len(drops)
+        fits = self._fits(
+            np.repeat(idx, m), np.repeat(self.kind[idx], m), np.repeat(self.rotation[idx], m),
+            np.repeat(self.x[idx], m), (y[:, None] + drops).ravel(),
+        ).reshape(n, m)
+        return y + np.argmin(fits, axis=1)
+
+    def _process_actions(self, actions: np.ndarray):
+        running = self.is_running
+        for action, dx in ((Action.MOVE_LEFT, -1), (Action.MOVE_RIGHT, 1)):
+            self._try_move(np.flatnonzero(running & (actions == action.value)), dx=dx)
+        self._try_move(np.flatnonzero(running & (actions == Action.SOFT_DROP.value)), dy=1)
+        self._rotate(np.flatnonzero(running & (actions == Action.ROTATE.value)))
+
+        idx = np.flatnonzero(running & (actions == Action.HARD_DROP.value))
+        if len(idx):
+            move_by = self._ghost_y(idx) - self.y[idx]
+            dropping = move_by != 0
+            self._try_move(idx[dropping], dy=move_by[dropping])
+            self._lock(idx)
+
+    def _rotate(self, idx):
+        rotation = (self.rotation[idx] + 1) % ROTATIONS
+        pending = np.ones(len(idx), dtype=bool)
+        for dx, dy in self.KICK_OFFSETS:
+            sub = np.flatnonzero(pending)
+            if not len(sub):
+                break
+            games = idx[sub]
+            fits = self._fits(games, self.kind[games], rotation[sub], self.x[games] + dx, self.y[games] + dy)
+            kicked = games[fits]
+            self.rotation[kicked] = rotation[sub[fits]]
+            self.x[kicked] += dx
+            self.y[kicked] += dy
+            pending[sub[fits]] = False
+
+    def _process_physics(self, dt: float):
+        idx = np.flatnonzero(self.is_running)
+        self.physics_acc[idx] += dt
+        while len(idx):
+            interval = self.physics_interval[idx]
+            idx = idx[self.physics_acc[idx] >= interval]
+            if not len(idx):
+                break
+            self.physics_acc[idx] -= self.physics_interval[idx]
+            moved = self._try_move(idx, dy=1)
+            self._lock(idx[~moved])
+
+    def _lock(self, idx):
+        if not len(idx):
+            return
+        self._merge(idx)
+        self.pieces_placed[idx] += 1
+        cleared = self._clear_lines(idx)
+        scored = cleared != 0
+        games = idx[scored]
+        self.score[games] += cleared[scored] * cleared[scored] * 100
+        self.cleared_lines[games] += cleared[scored]
+        self._update_level(games)
+        self._spawn(idx)
+
+    def _merge(self, idx):
+        kind, rotation = self.kind[idx], self.rotation[idx]
+        cells_x = self.x[idx, None] + CELLS_X[kind, rotation]
+        cells_y = self.y[idx, None] + CELLS_Y[kind, rotation]
+        on_board = (cells_y >= 0) & (cells_y < self.height) & (cells_x >= 0) & (cells_x < self.width)
+        games = np.broadcast_to(idx[:, None], cells_x.shape)[on_board]
+        cells_x, cells_y = cells_x[on_board], cells_y[on_board]
+        np.bitwise_or.at(self.board, (games, cells_y), np.left_shift(np.uint64(1), cells_x.astype(np.uint64)))
+        self.colors[games, cells_y, cells_x] = np.broadcast_to(kind[:, None], on_board.shape)[on_board]
+
+    def _clear_lines(self, idx) -> np.ndarray:
+        full = self.board[idx] == self.full_row
+        cleared = full.sum(axis=1)
+        games = idx[cleared != 0]
+        if len(games):
+            full = full[cleared != 0]
+            # full rows first, then the remaining rows in their original order
+            order = np.argsort(~full, axis=1, kind='stable')
+            board = np.take_along_axis(self.board[games], order, axis=1)
+            colors = np.take_along_axis(self.colors[games], order[:, :, None], axis=1)
+            emptied = np.arange(self.height) < cleared[cleared != 0][:, None]
+            board[emptied] = 0
+            colors[emptied] = 0
+            self.board[games] = board
+            self.colors[games] = colors
+        return cleared
+
+    def _update_level(self, idx):
+        new_level = 1 + self.cleared_lines[idx] // self.LEVEL_UP_EVERY_X_LINES
+        leveled = new_level > self.level[idx]
+        self.level[idx[leveled]] = new_level[leveled]
+        self._change_state(idx[leveled], GameState.LEVEL_UP, 0.5)
+
+    def _spawn(self, idx):
+        for i in idx[self.next_kind[idx] == 0]:
+            self.next_kind[i] = next(self.piece_gens[i]).kind.value
+        kind = self.next_kind[idx]
+        rotation = np.zeros(len(idx), dtype=np.int64)
+        x = (self.width - WIDTHS[kind, 0]) // 2
+        y = np.full(len(idx), -2, dtype=np.int64)
+
+        fits = self._fits(idx, kind, rotation, x, y + 1)
+        self._change_state(idx[~fits], GameState.GAME_OVER)
+
+        spawned = idx[fits]
+        self.kind[spawned] = kind[fits]
+        self.rotation[spawned] = 0
+        self.x[spawned] = x[fits]
+        self.y[spawned] = -2
+        for i in spawned:
+            self.next_kind[i] = next(self.piece_gens[i]).kind.value
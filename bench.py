@@ -0,0 +1,255 @@
+import argparse
+import json
+import platform
+import random
+import sys
+from collections.abc import Callable
+from datetime import datetime, timezone
+from functools import partial
+from time import perf_counter
+
+from input import Action
+from output import NullWriter
+from pieces import Piece, PieceType, bag_piece_generator
+from field import Field, BitboardField, SparseField
+from game import Game
+from headless import Simulation
+from renderer import Renderer, DiffRenderer
+from ai import Bot, PlacementSearch
+
+WIDTH = 10
+HEIGHT = 20
+SEED = 1234
+BACKENDS = {'list': Field, 'bitboard': BitboardField, 'sparse': SparseField}
+
+
+# --- Fixtures ---
+def empty_grid(rng: random.Random) -> list[list[int]]:
+    return [[0] * WIDTH for _ in range(HEIGHT)]
+
+def half_full_grid(rng: random.Random) -> list[list[int]]:
+    """Bottom half filled at ~70%, never a full row."""
+    grid = empty_grid(rng)
+    for y in range(HEIGHT // 2, HEIGHT):
+        for x in range(WIDTH):
+            if rng.random() < 0.7:
+                grid[y][x] = rng.choice(list(PieceType)).value
+        grid[y][rng.randrange(WIDTH)] = 0
+    return grid
+
+def tall_holes_grid(rng: random.Random) -> list[list[int]]:
+    """Stack up to two rows below the top, one or two holes in every row."""
+    grid = empty_grid(rng)
+    for y in range(2, HEIGHT):
+        grid[y] = [rng.choice(list(PieceType)).value for _ in range(WIDTH)]
+        for x in rng.sample(range(WIDTH), rng.randint(1, 2)):
+            grid[y][x] = 0
+    return grid
+
+def full_rows_grid(rng: random.Random) -> list[list[int]]:
+    """Half-full board with its bottom four rows complete, for line clears."""
+    grid = half_full_grid(rng)
+    for y in range(HEIGHT - 4, HEIGHT):
+        grid[y] = [PieceType.I.value] * WIDTH
+    return grid
+
+FIXTURES = {
+    'empty': empty_grid,
+    'half': half_full_grid,
+    'tall': tall_holes_grid,
+}
+
+
+def make_field(backend: type, fixture: Callable[[random.Random], list[list[int]]]):
+    field = backend(WIDTH, HEIGHT)
+    field.load(fixture(random.Random(SEED)))
+    return field
+
+def make_game(backend: type, fixture) -> Game:
+    game = Game(make_field(backend, fixture), partial(bag_piece_generator, SEED))
+    game.start()
+    return game
+
+def spawned_pieces(count: int = 64) -> list[Piece]:
+    pieces = []
+    for i, piece in zip(range(count), bag_piece_generator(SEED)):
+        piece.x, piece.y, piece.rotation = i % (WIDTH - 3), -1, i % 4
+        pieces.append(piece)
+    return pieces
+
+
+# --- Benchmarks ---
+# each returns (ops, seconds) for one timed run
+
+def bench_can_place(backend, fixture, number: int):
+    field = make_field(backend, fixture)
+    pieces = spawned_pieces()
+    started = perf_counter()
+    for i in range(number):
+        piece = pieces[i & 63]
+        field.can_place(piece, dy=i % HEIGHT)
+    return number, perf_counter() - started
+
+def bench_merge(backend, fixture, number: int):
+    fields = [make_field(backend, fixture) for _ in range(min(number, 200))]
+    piece = Piece(PieceType.T, WIDTH // 2, 0)
+    started = perf_counter()
+    for i in range(number):
+        fields[i % len(fields)].merge(piece)
+    return number, perf_counter() - started
+
+def bench_clear_lines(backend, fixture, number: int):
+    fields = [make_field(backend, full_rows_grid) for _ in range(number)]
+    started = perf_counter()
+    for field in fields:
+        field.clear_lines()
+    return number, perf_counter() - started
+
+def bench_rotated(number: int):
+    piece = Piece(PieceType.T, 4, 4)
+    started = perf_counter()
+    for _ in range(number):
+        piece = piece.rotated
+    return number, perf_counter() - started
+
+def bench_ghost_y(backend, fixture, number: int):
+    game = make_game(backend, fixture)
+    started = perf_counter()
+    for _ in range(number):
+        game.ghost_y
+    return number, perf_counter() - started
+
+def bench_snapshot(backend, fixture, number: int):
+    game = make_game(backend, fixture)
+    started = perf_counter()
+    for _ in range(number):
+        game.snapshot
+    return number, perf_counter() - started
+
+
+def bench_draw(renderer_class, fixture, number: int):
+    game = make_game(BitboardField, fixture)
+    renderer = renderer_class(WIDTH, HEIGHT, out=NullWriter())
+    snapshots = []
+    for i in range(8):
+        game.move_current_piece(x=1 if i % 2 else -1)
+        game.move_current_piece(y=1)
+        snapshots.append(game.snapshot)
+    started = perf_counter()
+    for i in range(number):
+        renderer.draw(snapshots[i & 7])
+    return number, perf_counter() - started
+
+def bench_headless_game(policy: str, number: int):
+    """Play seeded games until `number` pieces were placed in total."""
+    placed = 0
+    seed = SEED
+    started = perf_counter()
+    while placed < number:
+        simulation = Simulation(BitboardField(WIDTH, HEIGHT), partial(bag_piece_generator, seed))
+        game = simulation.game
+        if policy == 'bot':
+            get_action = Bot(PlacementSearch(WIDTH, HEIGHT, lookahead=False)).get_action
+        else:
+            rng = random.Random(seed)
+            choices = [None, None, None, *Action]
+            get_action = lambda game: rng.choice(choices)
+        simulation.start()
+        while game.pieces_placed + placed < number and simulation.step(get_action(game)):
+            pass
+        placed += game.pieces_placed
+        seed += 1
+    return placed, perf_counter() - started
+
+
+def benchmarks() -> dict[str, tuple[Callable[[int], tuple[int, float]], int]]:
+    """name -> (benchmark taking an op count, op count of one run)"""
+    suite: dict[str, tuple[Callable[[int], tuple[int, float]], int]] = {'piece.rotated': (bench_rotated, 200_000)}
+    for backend_name, backend in BACKENDS.items():
+        for fixture_name, fixture in FIXTURES.items():
+            suffix = f'{backend_name}.{fixture_name}'
+            suite[f'field.can_place.{suffix}'] = (partial(bench_can_place, backend, fixture), 100_000)
+            suite[f'field.merge.{suffix}'] = (partial(bench_merge, backend, fixture), 50_000)
+            suite[f'game.ghost_y.{suffix}'] = (partial(bench_ghost_y, backend, fixture), 50_000)
+            suite[f'game.snapshot.{suffix}'] = (partial(bench_snapshot, backend, fixture), 50_000)
+        suite[f'field.clear_lines.{backend_name}'] = (partial(bench_clear_lines, backend, full_rows_grid), 2_000)
+    for renderer_class in (Renderer, DiffRenderer):
+        for fixture_name, fixture in FIXTURES.items():
+            suite[f'renderer.draw.{renderer_class.__name__}.{fixture_name}'] = (
+                partial(bench_draw, renderer_class, fixture), 2_000,
+            )
+    suite['headless.random.pieces'] = (partial(bench_headless_game, 'random'), 2_000)
+    suite['headless.bot.pieces'] = (partial(bench_headless_game, 'bot'), 500)
+    return suite
+
+
+def run(names: list[str], repeat: int, scale: float) -> dict[str, dict]:
+    suite = benchmarks()
+    results = {}
+    for name in names:
+        bench, number = suite[name]
+        number = max(1, int(number * scale))
+        timings = []
+        for _ in range(repeat):
+            ops, seconds = bench(number)
+            timings.append(seconds / ops)
+        best = min(timings)
+        results[name] = {
+            'ns_per_op': round(best * 1e9, 1),
+            'ops_per_sec': round(1 / best, 1) if best else None,
+            'ops': number,
+            'repeat': repeat,
+        }
+        print(f'{name:45} {best * 1e9:12.1f} ns/op', file=sys.stderr)
+    return results
+
+
+def compare(results: dict[str, dict], baseline: dict[str, dict], threshold: float) -> list[str]:
+    """Names of benchmarks that got slower than the baseline by more than `threshold`."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]['ns_per_op'], result['ns_per_op']
+        change = after / before - 1 if before else 0.0
+        flag = 'REGRESSION' if change > threshold else 'faster' if change < -threshold else ''
+        print(f'{name:45} {before:12.1f} -> {after:12.1f} ns/op {change:+7.1%} {flag}', file=sys.stderr)
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Benchmark the engine hot paths.")
+    parser.add_argument('-o', '--output', help="write results as JSON to this file")
+    parser.add_argument('--compare', metavar='BASELINE', help="JSON results to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10, help="slowdown flagged as regression (0.10 = 10%%)")
+    parser.add_argument('-k', '--filter', default='', help="only run benchmarks whose name contains this")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--quick', action='store_true', help="run a tenth of the operations")
+    args = parser.parse_args(argv)
+
+    names = [name for name in benchmarks() if args.filter in name]
+    results = run(names, args.repeat, 0.1 if args.quick else 1.0)
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
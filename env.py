@@ -0,0 +1,252 @@
+import multiprocessing as mp
+import random
+from functools import partial
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from pieces import PieceGenerator, bag_piece_generator
+from game import GameState
+from batch import BatchGame
+from headless import TickClock, DEFAULT_TICK
+
+# Action ids a policy outputs: 0 is no-op, the rest are `Action.value`
+NUM_ACTIONS = 6
+
+
+def buffer_spec(num_envs: int, width: int, height: int) -> dict[str, tuple[tuple[int, ...], np.dtype]]:
+    """Name -> (shape, dtype) of every per-step array of a vector of `num_envs` environments."""
+    return {
+        'board': ((num_envs, height, width), np.dtype(np.bool_)),  # occupancy
+        'heights': ((num_envs, width), np.dtype(np.int16)),        # column heights
+        'piece': ((num_envs,), np.dtype(np.int8)),                 # current PieceType.value
+        'rotation': ((num_envs,), np.dtype(np.int8)),
+        'x': ((num_envs,), np.dtype(np.int16)),
+        'y': ((num_envs,), np.dtype(np.int16)),
+        'next_piece': ((num_envs,), np.dtype(np.int8)),
+        'reward': ((num_envs,), np.dtype(np.float32)),
+        'done': ((num_envs,), np.dtype(np.bool_)),
+        'final_score': ((num_envs,), np.dtype(np.int64)),  # score of the episode that just ended, where done
+        'action': ((num_envs,), np.dtype(np.int8)),
+    }
+
+OBSERVATION_KEYS = ('board', 'heights', 'piece', 'rotation', 'x', 'y', 'next_piece')
+
+def allocate(spec: dict, buf=None) -> dict[str, np.ndarray]:
+    """Arrays for `spec`, laid out back to back in `buf` (fresh memory when None)."""
+    arrays = {}
+    offset = 0
+    for name, (shape, dtype) in spec.items():
+        offset = -(-offset // 8) * 8  # keep every array 8-byte aligned
+        size = int(np.prod(shape)) * dtype.itemsize
+        if buf is None:
+            arrays[name] = np.zeros(shape, dtype=dtype)
+        else:
+            arrays[name] = np.ndarray(shape, dtype=dtype, buffer=buf, offset=offset)
+        offset += size
+    return arrays
+
+def buffer_size(spec: dict) -> int:
+    offset = 0
+    for shape, dtype in spec.values():
+        offset = -(-offset // 8) * 8 + int(np.prod(shape)) * dtype.itemsize
+    return offset
+
+
+class VectorEnv:
+    """
+    `num_envs` Tetris games stepped in lockstep on a `BatchGame`, one tick
+    per step (`frame_skip` ticks with the action on the first one).
+
+    `reset()` and `step()` return observations in arrays allocated once and
+    overwritten on every call. Copy them to keep them. The reward is the
+    score gained during the step. A game that ends is restarted in place
+    right away: its `done` flag is set, `final_score` holds its score, and
+    the observation is already that of the next episode.
+    """
+    def __init__(
+        self,
+        num_envs: int,
+        width: int = 10,
+        height: int = 20,
+        tick: float = DEFAULT_TICK,
+        frame_skip: int = 1,
+        buffers: dict[str, np.ndarray] | None = None,
+        seed_offset: int = 0,
+        seed_stride: int | None = None,
+    ):
+        self.num_envs = num_envs
+        self.width = width
+        self.height = height
+        self.frame_skip = frame_skip
+        self.clock = TickClock(tick)
+        self.generators: list[PieceGenerator] = [bag_piece_generator() for _ in range(num_envs)]
+        self.game = BatchGame(width, height, [partial(iter, gen) for gen in self.generators], clock=self.clock)
+        self.buffers = buffers if buffers is not None else allocate(buffer_spec(num_envs, width, height))
+        self.observation = {key: self.buffers[key] for key in OBSERVATION_KEYS}
+        # environment i plays episode k with seed + offset + i + k * stride
+        self._seed: int | None = None
+        self._seed_offset = seed_offset
+        self._seed_stride = seed_stride or num_envs
+        self._episodes = [0] * num_envs
+        self._rng = random.Random()
+        self._last_score = np.zeros(num_envs, dtype=np.int64)
+        self._no_action = np.zeros(num_envs, dtype=np.int8)
+        self._top = np.zeros((num_envs, width), dtype=np.intp)
+
+    def _episode_seed(self, i: int) -> int:
+        if self._seed is None:
+            return self._rng.getrandbits(64)
+        episode = self._episodes[i]
+        self._episodes[i] += 1
+        return self._seed + self._seed_offset + i + episode * self._seed_stride
+
+    def reset(self, seed: int | None = None) -> dict[str, np.ndarray]:
+        """
+        Restart every environment. With a `seed`, episode k of environment i
+        plays the pieces of seed + i + k * num_envs.
+        """
+        self._seed = seed
+        self._episodes = [0] * self.num_envs
+        self._restart(np.arange(self.num_envs))
+        self.buffers['reward'][:] = 0
+        self.buffers['done'][:] = False
+        self._observe()
+        return self.observation
+
+    def step(self, actions: np.ndarray | None = None):
+        """Apply one action id per environment; returns (observation, reward, done)."""
+        game = self.game
+        actions = self._no_action if actions is None else actions
+        for skip in range(self.frame_skip):
+            self.clock.advance()
+            game.process(self.clock.tick, actions if not skip else None)
+
+        reward, done = self.buffers['reward'], self.buffers['done']
+        np.subtract(game.score, self._last_score, out=reward, casting='unsafe')
+        np.equal(game.state, GameState.GAME_OVER.value, out=done)
+        ended = np.flatnonzero(done)
+        if len(ended):
+            self.buffers['final_score'][ended] = game.score[ended]
+            self._restart(ended)
+        self._last_score[:] = game.score
+        self._observe()
+        return self.observation, reward, done
+
+    def _restart(self, idx: np.ndarray):
+        for i in idx:
+            self.generators[i].reset(self._episode_seed(int(i)))
+        self.game.restart(idx)
+        self._last_score[idx] = 0
+
+    def _observe(self):
+        game, buffers = self.game, self.buffers
+        board = buffers['board']
+        np.not_equal(game.colors, 0, out=board)
+        # first filled row of every column, 0 for empty columns too
+        top = self._top
+        np.argmax(board, axis=1, out=top)
+        heights = buffers['heights']
+        np.subtract(self.height, top, out=heights, casting='unsafe')
+        heights[(top == 0) & ~board[:, 0, :]] = 0
+        buffers['piece'][:] = game.kind
+        buffers['rotation'][:] = game.rotation
+        buffers['x'][:] = game.x
+        buffers['y'][:] = game.y
+        buffers['next_piece'][:] = game.next_kind
+
+
+def _shard_worker(conn: Connection, shm_name: str, num_envs: int, start: int, stop: int, width: int, height: int, tick: float, frame_skip: int):
+    # track= is valid since 3.13, stubs for older versions reject it
+    shm = SharedMemory(name=shm_name, track=False)  # type: ignore[call-arg]
+    try:
+        shared = allocate(buffer_spec(num_envs, width, height), shm.buf)
+        env = VectorEnv(
+            stop - start, width, height, tick, frame_skip,
+            buffers={name: array[start:stop] for name, array in shared.items()},
+            seed_offset=start, seed_stride=num_envs,
+        )
+        actions = shared['action'][start:stop]
+        while True:
+            command, arg = conn.recv()
+            if command == 'step':
+                env.step(actions)
+            elif command == 'reset':
+                env.reset(arg)
+            elif command == 'close':
+                break
+            conn.send(None)
+        del env, shared, actions
+    finally:
+        shm.close()
+
+
+class ShardedVectorEnv:
+    """
+    `VectorEnv` split over `num_shards` worker processes. Observations,
+    rewards, done flags and actions live in one shared memory block, so a
+    step only sends a short command down each pipe. The returned arrays are
+    views of that block, overwritten by every step.
+    """
+    def __init__(
+        self,
+        num_envs: int,
+        num_shards: int,
+        width: int = 10,
+        height: int = 20,
+        tick: float = DEFAULT_TICK,
+        frame_skip: int = 1,
+    ):
+        self.num_envs = num_envs
+        spec = buffer_spec(num_envs, width, height)
+        self._shm = SharedMemory(create=True, size=buffer_size(spec))
+        self.buffers = allocate(spec, self._shm.buf)
+        self.observation = {key: self.buffers[key] for key in OBSERVATION_KEYS}
+
+        bounds = np.linspace(0, num_envs, num_shards + 1).astype(int)
+        self._conns: list[Connection] = []
+        self._workers: list[mp.Process] = []
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            parent, child = mp.Pipe()
+            worker = mp.Process(
+                target=_shard_worker,
+                args=(child, self._shm.name, num_envs, int(start), int(stop), width, height, tick, frame_skip),
+                daemon=True,
+            )
+            worker.start()
+            child.close()
+            self._conns.append(parent)
+            self._workers.append(worker)
+
+    def _broadcast(self, command: str, arg=None):
+        for conn in self._conns:
+            conn.send((command, arg))
+        for conn in self._conns:
+            conn.recv()
+
+    def reset(self, seed: int | None = None) -> dict[str, np.ndarray]:
+        """Seeds like `VectorEnv.reset`, so both play the same games for the same seed."""
+        self._broadcast('reset', seed)
+        return self.observation
+
+    def step(self, actions: np.ndarray | None = None):
+        """Apply one action id per environment; returns (observation, reward, done)."""
+        self.buffers['action'][:] = 0 if actions is None else actions
+        self._broadcast('step')
+        return self.observation, self.buffers['reward'], self.buffers['done']
+
+    def close(self):
+        for conn in self._conns:
+            conn.send(('close', None))
+        for worker in self._workers:
+            worker.join()
+        self.observation = self.buffers = None
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self) -> 'ShardedVectorEnv':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,48 +1,443 @@
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+from copy import copy
+from typing import Self
+
 from pieces import Piece
 from snapshot import FieldSnapshot
+from zobrist import row_key
+
+_STALE_ROW: tuple[int, ...] = ()  # snapshot row to rebuild, real rows are never empty
 
 
-class Field:
+class BaseField(ABC):
+    """
+    Bookkeeping shared by the field backends. Snapshots are immutable, cached
+    per `version` and share the row tuples of rows that did not change.
+    Column surface heights and per-row fill counts are kept up to date by
+    `merge` and `clear_lines`. They also track which rows the 64-bit
+    `board_key` is stale for, and only those are rehashed when it is read.
+    """
     def __init__(self, width: int, height: int):
         self.width = width
         self.height = height
+        self.heights = [0] * width      # filled height of every column, 0 if empty
+        self.row_counts = [0] * height  # filled cells of every row
+        self.row_keys = [0] * height    # row_key() of every row, except stale ones
+        self._board_key = 0             # XOR of row_keys
+        self._stale_keys: set[int] | None = set()  # None when every row key is stale
+        self.version = 0
+        self._empty_row = (0,) * width
+        self._snapshot_rows: list[tuple[int, ...]] = [self._empty_row] * height
+        self._snapshot: FieldSnapshot | None = None
+    
+    @abstractmethod
+    def _row_values(self, y: int) -> tuple[int, ...]:
+        """Cell values of row `y`."""
+    
+    @abstractmethod
+    def _is_filled(self, x: int, y: int) -> bool:
+        """Whether cell (`x`, `y`) is occupied."""
+    
+    @abstractmethod
+    def _row_mask(self, y: int) -> int:
+        """Occupancy bitmask of row `y`."""
+    
+    @abstractmethod
+    def can_place(self, piece: Piece, dx=0, dy=0) -> bool:
+        """Whether `piece` moved by (dx, dy) fits inside the field without overlapping."""
+    
+    @abstractmethod
+    def load(self, grid: Sequence[Sequence[int]]):
+        """Replace the field contents with `grid`."""
+    
+    @abstractmethod
+    def merge(self, piece: Piece):
+        """Write the cells of `piece` into the field."""
+    
+    @abstractmethod
+    def clear_lines(self) -> int:
+        """Remove full rows, return how many there were."""
+    
+    @property
+    @abstractmethod
+    def row_masks(self) -> tuple[int, ...]:
+        """Rows as bitmasks, bit N set when column N is occupied."""
+    
+    def fork(self) -> Self:
+        """Independent copy of the field, sharing the immutable snapshot rows."""
+        forked = copy(self)
+        forked.heights = self.heights[:]
+        forked.row_counts = self.row_counts[:]
+        forked.row_keys = self.row_keys[:]
+        forked._stale_keys = None if self._stale_keys is None else set(self._stale_keys)
+        forked._snapshot_rows = self._snapshot_rows[:]
+        return forked
+    
+    def _column_height(self, x: int, top: int = 0) -> int:
+        """Scan column `x` downwards from row `top` for its surface."""
+        for y in range(top, self.height):
+            if self._is_filled(x, y):
+                return self.height - y
+        return 0
+    
+    def _recount(self):
+        self.heights = [self._column_height(x) for x in range(self.width)]
+        self.row_counts = [
+            sum(self._is_filled(x, y) for x in range(self.width))
+            for y in range(self.height)
+        ]
+    
+    def landing_y(self, piece: Piece) -> int:
+        """Row where `piece` ends up when dropped straight down."""
+        orientation = piece.orientation
+        landing = self.height
+        for col_idx, bottom in enumerate(orientation.bottom):
+            if bottom < 0:
+                continue
+            top = self.height - self.heights[piece.x + col_idx]
+            if piece.y + bottom >= top:
+                # piece is tucked under the surface, walk down cell by cell
+                y = piece.y
+                while self.can_place(piece, dy=y + 1 - piece.y):
+                    y += 1
+                return y
+            landing = min(landing, top - 1 - bottom)
+        return landing
+    
+    def _rows_changed(self, rows):
+        for y in rows:
+            self._snapshot_rows[y] = _STALE_ROW
+        if self._stale_keys is not None:
+            self._stale_keys.update(rows)
+        self.version += 1
+        self._snapshot = None
+    
+    def _rows_cleared(self, kept: list[int]):
+        """Rows at indices `kept` slid down, the rest were cleared."""
+        cleared = self.height - len(kept)
+        self._snapshot_rows = [self._empty_row] * cleared + [self._snapshot_rows[i] for i in kept]
+        self.row_counts = [0] * cleared + [self.row_counts[i] for i in kept]
+        
+        # the key of a row depends on its index: rows below the lowest cleared
+        # one keep theirs, moved rows go stale unless empty
+        old_keys, old_stale = self.row_keys, self._stale_keys
+        self.row_keys = [0] * cleared + [old_keys[i] for i in kept]
+        if old_stale is not None:
+            for y in set(range(self.height)).difference(kept):
+                self._board_key ^= old_keys[y]
+            self._stale_keys = {
+                y for y, old_y in enumerate(kept, cleared)
+                if old_y in old_stale or (old_y != y and old_keys[old_y])
+            }
+        
+        # full rows lie under every column surface, so columns just sink
+        # unless their top cell was cleared
+        kept_rows = set(kept)
+        for x, column_height in enumerate(self.heights):
+            if self.height - column_height in kept_rows:
+                self.heights[x] = column_height - cleared
+            else:
+                self.heights[x] = self._column_height(x, top=self.height - column_height + cleared)
+        self.version += 1
+        self._snapshot = None
+    
+    def _rows_deleted(self, full: list[int]):
+        """
+        Rows `full` (ascending) were deleted and as many empty rows inserted
+        on top. Unlike `_rows_cleared` the bookkeeping lists are edited in
+        place, so the cost is a memmove instead of a Python loop per row.
+        """
+        cleared = len(full)
+        for y in reversed(full):
+            del self._snapshot_rows[y], self.row_counts[y], self.row_keys[y]
+        self._snapshot_rows[0:0] = [self._empty_row] * cleared
+        self.row_counts[0:0] = [0] * cleared
+        self.row_keys[0:0] = [0] * cleared
+        # moved rows change key with their index, rehash on the next read
+        self._stale_keys = None
+        
+        # full rows lie under every column surface: columns whose top cell
+        # was cleared are rescanned, the rest sink
+        top_cleared = full[0]
+        for x, column_height in enumerate(self.heights):
+            if self.height - column_height == top_cleared:
+                self.heights[x] = self._column_height(x, top=top_cleared + cleared)
+            else:
+                self.heights[x] = column_height - cleared
+        self.version += 1
+        self._snapshot = None
+    
+    def window(self, top: int, rows: int, left: int = 0, cols: int | None = None) -> FieldSnapshot:
+        """
+        Snapshot of `rows` rows from row `top` (and `cols` columns from
+        `left`), built from the changed rows of that window only.
+        """
+        snapshot_rows = self._snapshot_rows
+        for y in range(top, top + rows):
+            if snapshot_rows[y] is _STALE_ROW:
+                snapshot_rows[y] = self._row_values(y)
+        grid = snapshot_rows[top:top + rows]
+        if cols is None or cols >= self.width:
+            cols, left = self.width, 0
+        else:
+            grid = [row[left:left + cols] for row in grid]
+        return FieldSnapshot(
+            width = cols,
+            height = rows,
+            grid = tuple(grid),
+            version = self.version,
+            top = top,
+            left = left,
+        )
+    
+    @property
+    def board_key(self) -> int:
+        """
+        64-bit key of the occupancy (colors are ignored): the XOR of
+        `row_key(mask, y)` over the rows.
+        """
+        if self._stale_keys is None:
+            row_keys = self.row_keys
+            key = 0
+            for y in range(self.height):
+                mask = self._row_mask(y)
+                row_keys[y] = row_key(mask, y) if mask else 0
+                key ^= row_keys[y]
+            self._board_key = key
+            self._stale_keys = set()
+        elif self._stale_keys:
+            row_keys, key = self.row_keys, self._board_key
+            for y in self._stale_keys:
+                new_key = row_key(self._row_mask(y), y)
+                key ^= row_keys[y] ^ new_key
+                row_keys[y] = new_key
+            self._board_key = key
+            self._stale_keys = set()
+        return self._board_key
+    
+    @property
+    def snapshot(self) -> FieldSnapshot:
+        if self._snapshot is None:
+            rows = self._snapshot_rows
+            for y, row in enumerate(rows):
+                if row is _STALE_ROW:
+                    rows[y] = self._row_values(y)
+            self._snapshot = FieldSnapshot(
+                width = self.width,
+                height = self.height,
+                grid = tuple(rows),
+                version = self.version,
+            )
+        return self._snapshot
+
+
+class Field(BaseField):
+    def __init__(self, width: int, height: int):
+        super().__init__(width, height)
         self.grid = [[0] * self.width for _ in range(self.height)]
+    
+    def _row_values(self, y: int) -> tuple[int, ...]:
+        return tuple(self.grid[y])
+    
+    def _is_filled(self, x: int, y: int) -> bool:
+        return self.grid[y][x] != 0
+    
+    def _row_mask(self, y: int) -> int:
+        return sum(1 << col_idx for col_idx, cell in enumerate(self.grid[y]) if cell)
+    
+    def fork(self) -> Self:
+        forked = super().fork()
+        forked.grid = [row[:] for row in self.grid]
+        return forked
+    
+    def load(self, grid: Sequence[Sequence[int]]):
+        self.grid = [list(row) for row in grid]
+        self._recount()
+        self._rows_changed(range(self.height))
         
     def merge(self, piece: Piece):
-        for row_idx, row in enumerate(piece.shape):
-            for col_idx, cell in enumerate(row):
-                if not cell:
-                    continue
-                board_y = piece.y + row_idx
-                board_x = piece.x + col_idx
-                
-                if 0 <= board_y < self.height and 0 <= board_x < self.width:
-                    self.grid[board_y][board_x] = cell
-    
-    def clear_lines(self):
-        new_field = [row for row in self.grid if 0 in row]
-        cleared_lines = self.height - len(new_field)
-        self.grid = [[0] * self.width for _ in range(cleared_lines)] + new_field
+        cell = piece.kind.value
+        for col_idx, row_idx in piece.orientation.cells:
+            board_y = piece.y + row_idx
+            board_x = piece.x + col_idx
+            
+            if 0 <= board_y < self.height and 0 <= board_x < self.width:
+                if not self.grid[board_y][board_x]:
+                    self.row_counts[board_y] += 1
+                    self.heights[board_x] = max(self.heights[board_x], self.height - board_y)
+                self.grid[board_y][board_x] = cell
+        self._rows_changed(range(max(piece.y, 0), min(piece.y + piece.height, self.height)))
+    
+    def clear_lines(self) -> int:
+        kept = [y for y, count in enumerate(self.row_counts) if count != self.width]
+        cleared_lines = self.height - len(kept)
+        if cleared_lines:
+            self.grid = [[0] * self.width for _ in range(cleared_lines)] + [self.grid[y] for y in kept]
+            self._rows_cleared(kept)
         return cleared_lines
     
+    @property
+    def row_masks(self) -> tuple[int, ...]:
+        return tuple(self._row_mask(y) for y in range(self.height))
+    
     def can_place(self, piece: Piece, dx=0, dy=0):
         """Check if `piece` can be placed at (x+dx, y+dy)."""
-        for row_idx, row in enumerate(piece.shape):
-            for col_idx, cell in enumerate(row):
-                if not cell: 
-                    continue
-                board_x = piece.x + col_idx + dx
-                board_y = piece.y + row_idx + dy
-                if board_x < 0 or board_x >= self.width or board_y >= self.height:
-                    return False
-                if board_y >= 0 and self.grid[board_y][board_x]:
-                    return False
+        for col_idx, row_idx in piece.orientation.cells:
+            board_x = piece.x + col_idx + dx
+            board_y = piece.y + row_idx + dy
+            if board_x < 0 or board_x >= self.width or board_y >= self.height:
+                return False
+            if board_y >= 0 and self.grid[board_y][board_x]:
+                return False
         return True
+
+
+class BitboardField(BaseField):
+    """
+    Field backend that keeps every row as an integer bitmask (bit N is column N)
+    plus a parallel color plane of bytearrays. Same public API as `Field`.
+    """
+    def __init__(self, width: int, height: int):
+        super().__init__(width, height)
+        self.full_row = (1 << width) - 1
+        self.rows = [0] * height
+        self.colors = [bytearray(width) for _ in range(height)]
+    
+    def _row_values(self, y: int) -> tuple[int, ...]:
+        return tuple(self.colors[y])
+    
+    def _is_filled(self, x: int, y: int) -> bool:
+        return bool(self.rows[y] >> x & 1)
+    
+    def _row_mask(self, y: int) -> int:
+        return self.rows[y]
     
     @property
-    def snapshot(self):
-        return FieldSnapshot(
-            width = self.width,
-            height = self.height,
-            grid = [row[:] for row in self.grid],
-        )
+    def grid(self) -> list[list[int]]:
+        return [list(row) for row in self.colors]
+    
+    def fork(self) -> Self:
+        forked = super().fork()
+        forked.rows = self.rows[:]
+        forked.colors = [bytearray(row) for row in self.colors]
+        return forked
+    
+    def load(self, grid: Sequence[Sequence[int]]):
+        self.colors = [bytearray(row) for row in grid]
+        self.rows = [
+            sum(1 << col_idx for col_idx, cell in enumerate(row) if cell)
+            for row in grid
+        ]
+        self._recount()
+        self._rows_changed(range(self.height))
+    
+    def merge(self, piece: Piece):
+        cell = piece.kind.value
+        for col_idx, row_idx in piece.orientation.cells:
+            board_y = piece.y + row_idx
+            board_x = piece.x + col_idx
+            if 0 <= board_y < self.height and 0 <= board_x < self.width:
+                if not self.rows[board_y] >> board_x & 1:
+                    self.row_counts[board_y] += 1
+                    self.heights[board_x] = max(self.heights[board_x], self.height - board_y)
+                self.rows[board_y] |= 1 << board_x
+                self.colors[board_y][board_x] = cell
+        self._rows_changed(range(max(piece.y, 0), min(piece.y + piece.height, self.height)))
+    
+    def clear_lines(self) -> int:
+        full_row = self.full_row
+        kept = [i for i, mask in enumerate(self.rows) if mask != full_row]
+        cleared_lines = self.height - len(kept)
+        if cleared_lines:
+            self.rows = [0] * cleared_lines + [self.rows[i] for i in kept]
+            self.colors = [bytearray(self.width) for _ in range(cleared_lines)] + [self.colors[i] for i in kept]
+            self._rows_cleared(kept)
+        return cleared_lines
+    
+    @property
+    def row_masks(self) -> tuple[int, ...]:
+        return tuple(self.rows)
+    
+    def can_place(self, piece: Piece, dx=0, dy=0):
+        """Check if `piece` can be placed at (x+dx, y+dy)."""
+        orientation = piece.orientation
+        x = piece.x + dx
+        y = piece.y + dy
+        if x + orientation.min_col < 0 or x + orientation.max_col >= self.width:
+            return False
+        for row_idx, mask in enumerate(orientation.row_masks):
+            if not mask:
+                continue
+            mask = mask << x if x >= 0 else mask >> -x
+            board_y = y + row_idx
+            if board_y >= self.height:
+                return False
+            if board_y >= 0 and self.rows[board_y] & mask:
+                return False
+        return True
+
+
+class SparseField(BitboardField):
+    """
+    `BitboardField` for large boards (any width, thousands of rows). Empty
+    rows share one color row and one snapshot row. `clear_lines` only checks
+    the rows covered by the last merge and removes full rows in place.
+    Together with `window` snapshots, the cost of a tick depends on the
+    piece, not on the board size.
+    """
+    def __init__(self, width: int, height: int):
+        BaseField.__init__(self, width, height)
+        self.full_row = (1 << width) - 1
+        self.rows = [0] * height
+        self._empty_colors = bytearray(width)  # shared by every empty row, never written, replaced on first write
+        self.colors = [self._empty_colors] * height
+        self._merged_rows = range(0)      # rows `clear_lines` checks
+    
+    def _row_values(self, y: int) -> tuple[int, ...]:
+        colors = self.colors[y]
+        return self._empty_row if colors is self._empty_colors else tuple(colors)
+    
+    def fork(self) -> Self:
+        forked = BaseField.fork(self)
+        forked.rows = self.rows[:]
+        empty = self._empty_colors
+        forked.colors = [row if row is empty else bytearray(row) for row in self.colors]
+        return forked
+    
+    def load(self, grid: Sequence[Sequence[int]]):
+        super().load(grid)
+        empty = self._empty_colors
+        self.colors = [colors if any(colors) else empty for colors in self.colors]
+        self._merged_rows = range(self.height)
+    
+    def merge(self, piece: Piece):
+        cell = piece.kind.value
+        rows, colors, empty = self.rows, self.colors, self._empty_colors
+        for col_idx, row_idx in piece.orientation.cells:
+            board_y = piece.y + row_idx
+            board_x = piece.x + col_idx
+            if 0 <= board_y < self.height and 0 <= board_x < self.width:
+                if not rows[board_y] >> board_x & 1:
+                    self.row_counts[board_y] += 1
+                    self.heights[board_x] = max(self.heights[board_x], self.height - board_y)
+                rows[board_y] |= 1 << board_x
+                if colors[board_y] is empty:
+                    colors[board_y] = bytearray(self.width)
+                colors[board_y][board_x] = cell
+        self._merged_rows = range(max(piece.y, 0), min(piece.y + piece.height, self.height))
+        self._rows_changed(self._merged_rows)
+    
+    def clear_lines(self) -> int:
+        full_row, rows = self.full_row, self.rows
+        full = [y for y in self._merged_rows if rows[y] == full_row]
+        self._merged_rows = range(0)
+        if not full:
+            return 0
+        cleared_lines = len(full)
+        for y in reversed(full):
+            del rows[y], self.colors[y]
+        rows[0:0] = [0] * cleared_lines
+        self.colors[0:0] = [self._empty_colors] * cleared_lines
+        self._rows_deleted(full)
+        return cleared_lines
@@ -1,11 +1,14 @@
 from collections.abc import Iterator, Callable
+from copy import copy
 from enum import Enum, auto
 from time import perf_counter
+from typing import Protocol
 
 from input import Action
-from pieces import Piece
-from field import Field
-from snapshot import GameSnapshot
+from pieces import Piece, PieceType
+from field import BaseField
+from snapshot import GameSnapshot, PieceSnapshot
+from zobrist import position_key
 
 
 class GameState(Enum):
@@ -13,27 +16,50 @@ class GameState(Enum):
     LEVEL_UP = auto()
     GAME_OVER = auto()
 
+
+class GameHook(Protocol):
+    """Observer set as `Game.hook`, e.g. a replay recorder."""
+    def before_process(self, dt: float, action: Action | None) -> float:
+        """Called before every tick, returns the dt the tick runs with."""
+        ...
+
+    def after_process(self) -> None: ...
+
+    def after_spawn(self) -> None:
+        """Called after every spawn attempt, including the one ending the game."""
+        ...
+
+
 class Game:   
     MIN_GRAVITY = 0.05
     MAX_GRAVITY = 0.3
+    GRAVITY_STEP = 0.02
     LEVEL_UP_EVERY_X_LINES = 1
     KICK_OFFSETS = [(0, 0), (1, 0), (-1, 0), (2, 0), (-2, 0), (0, -1)]
 
-    def __init__(self, field: Field, piece_generator: Callable[[], Iterator[Piece]]):
-        self.field: Field = field
+    def __init__(
+        self,
+        field: BaseField,
+        piece_generator: Callable[[], Iterator[Piece]],
+        clock: Callable[[], float] = perf_counter,
+    ):
+        self.field: BaseField = field
+        self.clock = clock
         self.piece_gen: Iterator[Piece] = piece_generator()
         self.next_piece: Piece | None = None
         self.current_piece: Piece | None = None
+        self.hook: GameHook | None = None
         
         self._prev_state: GameState | None = None
         self._current_state: GameState = GameState.RUNNING
         self._next_state_timer: float = 0.0
         self._physics_acc: float = 0.0
         
-        self.game_started_at: float = perf_counter()
+        self.game_started_at: float = self.clock()
         self.score = 0
         self.cleared_lines = 0
         self.level = 1
+        self.pieces_placed = 0
     
     @property
     def is_running(self) -> bool:
@@ -49,31 +75,107 @@ class Game:
 
     @property
     def physics_interval(self) -> float:
-        return max(self.MIN_GRAVITY, self.MAX_GRAVITY - (self.level -1) * 0.02)
+        return max(self.MIN_GRAVITY, self.MAX_GRAVITY - (self.level -1) * self.GRAVITY_STEP)
     
     @property
     def playtime(self) -> float:
-        return perf_counter() - self.game_started_at
+        return self.clock() - self.game_started_at
+    
+    @property
+    def time_to_next_update(self) -> float:
+        """Seconds until gravity or a state timer changes the game without input."""
+        waits = []
+        if self.is_running:
+            waits.append(self.physics_interval - self._physics_acc)
+        if self._next_state_timer:
+            waits.append(self._next_state_timer - self.clock())
+        return max(0.0, min(waits)) if waits else float('inf')
     
     @property
     def ghost_y(self) -> int:
-        y = self.current_piece.y
-        while self.field.can_place(self.current_piece, dy=y + 1 - self.current_piece.y):
-            y += 1
-        return y
+        """Row the current piece would drop to, 0 when there is none."""
+        piece = self.current_piece
+        return self.field.landing_y(piece) if piece else 0
+    
+    @property
+    def key(self) -> int:
+        """64-bit identity of the position: board occupancy, current piece and next kind."""
+        return position_key(self.field.board_key, self.current_piece, self.next_piece)
     
     @property
     def snapshot(self) -> GameSnapshot:
         return GameSnapshot(
             field=self.field.snapshot,
-            current_piece=self.current_piece,
-            next_piece=self.next_piece,
+            current_piece=PieceSnapshot.of(self.current_piece),
+            next_piece=PieceSnapshot.of(self.next_piece),
             ghost_y=self.ghost_y,
             level=self.level,
             score=self.score,
             playtime=self.playtime
         )
     
+    def viewport(self, rows: int, cols: int | None = None) -> GameSnapshot:
+        """
+        Snapshot of a `rows` x `cols` window of the field that follows the
+        current piece, for boards too large to draw whole. Piece and ghost
+        positions are relative to the window (`field.top`, `field.left`).
+        """
+        field = self.field
+        rows = min(rows, field.height)
+        cols = min(cols or field.width, field.width)
+        piece = self.current_piece
+        top = left = 0
+        if piece:
+            top = min(max(piece.y + piece.height // 2 - rows // 2, 0), field.height - rows)
+            left = min(max(piece.x + piece.width // 2 - cols // 2, 0), field.width - cols)
+        return GameSnapshot(
+            field=field.window(top, rows, left, cols),
+            current_piece=PieceSnapshot(piece.kind, piece.rotation, piece.x - left, piece.y - top) if piece else None,
+            next_piece=PieceSnapshot.of(self.next_piece),
+            ghost_y=self.ghost_y - top if piece else 0,
+            level=self.level,
+            score=self.score,
+            playtime=self.playtime
+        )
+    
+    def preview(self, count: int) -> list[PieceType]:
+        """Kinds of the next `count` pieces, starting with `next_piece`."""
+        if not self.next_piece or count <= 0:
+            return []
+        peek = getattr(self.piece_gen, 'peek', None)
+        upcoming = peek(count - 1) if peek else []
+        return [self.next_piece.kind, *upcoming]
+    
+    def fork(self) -> 'Game':
+        """
+        Independent copy of the game for what-if play. The field is copied,
+        its snapshot rows are shared, and the piece generator is forked so
+        both games deal the same pieces. Instance hooks (recorders,
+        profilers) are not carried over. The fork reads the same clock.
+        """
+        fork_generator = getattr(self.piece_gen, 'fork', None)
+        if fork_generator is None:
+            raise TypeError("piece generator cannot be forked")
+        forked = object.__new__(type(self))
+        forked.field = self.field.fork()
+        forked.clock = self.clock
+        forked.piece_gen = fork_generator()
+        forked.next_piece = copy(self.next_piece)
+        forked.current_piece = copy(self.current_piece)
+        forked.hook = None
+        
+        forked._prev_state = self._prev_state
+        forked._current_state = self._current_state
+        forked._next_state_timer = self._next_state_timer
+        forked._physics_acc = self._physics_acc
+        
+        forked.game_started_at = self.game_started_at
+        forked.score = self.score
+        forked.cleared_lines = self.cleared_lines
+        forked.level = self.level
+        forked.pieces_placed = self.pieces_placed
+        return forked
+    
     def get_spawning_pos(self, piece: Piece) -> tuple[int, int]:
         x = (self.field.width - piece.width) // 2
         y = -2
@@ -91,10 +193,11 @@ class Game:
         
         if not self.field.can_place(new_piece, dy=1):
             self.change_state(GameState.GAME_OVER)
-            return
-        
-        self.current_piece = new_piece
-        self.next_piece = next(self.piece_gen)
+        else:
+            self.current_piece = new_piece
+            self.next_piece = next(self.piece_gen)
+        if self.hook:
+            self.hook.after_spawn()
     
     def rotate(self):
         rotated: Piece = self.current_piece.rotated
@@ -115,12 +218,12 @@ class Game:
     
     def change_state(self, new_state: GameState, timer: float = 0.0):
         if new_state == self._current_state: return
-        self._next_state_timer = perf_counter() + timer if timer else 0.0
+        self._next_state_timer = self.clock() + timer if timer else 0.0
         self._prev_state = self._current_state
         self._current_state = new_state
     
     def _process_state_transitions(self):
-        if self._next_state_timer and self._next_state_timer <= perf_counter():
+        if self._next_state_timer and self._next_state_timer <= self.clock():
             self.change_state(self._prev_state)
         
     def _process_physics(self, dt: float):
@@ -134,6 +237,7 @@ class Game:
     
     def lock_piece(self):
         self.field.merge(self.current_piece)
+        self.pieces_placed += 1
         cleared_lines = self.field.clear_lines()
         if cleared_lines:
             self.score += cleared_lines * cleared_lines * 100
@@ -143,9 +247,14 @@ class Game:
         self.spawn_piece()
 
     def process(self, dt: float, action: Action | None = None, ):
+        hook = self.hook
+        if hook:
+            dt = hook.before_process(dt, action)
         self._process_state_transitions()
         self._process_action(action)
         self._process_physics(dt)
+        if hook:
+            hook.after_process()
     
     def _process_action(self, action: Action | None):
         if not self.is_running or not action:
@@ -159,7 +268,7 @@ class Game:
             self.rotate()
         elif action == Action.SOFT_DROP:
             self.move_current_piece(y=1)
-        elif action == Action.HARD_DROP:
+        elif action == Action.HARD_DROP and self.current_piece:
             move_by = self.ghost_y - self.current_piece.y
             self.move_current_piece(y=move_by)
             self.lock_piece()
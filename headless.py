@@ -0,0 +1,73 @@
+from collections.abc import Callable, Iterable, Iterator
+
+from input import Action
+from pieces import Piece
+from field import BaseField
+from game import Game
+
+DEFAULT_TICK = 0.01
+
+
+class TickClock:
+    """Clock for `Game` driven by a pure tick count instead of wall time."""
+    def __init__(self, tick: float = DEFAULT_TICK):
+        self.tick = tick
+        self.ticks = 0
+    
+    def __call__(self) -> float:
+        return self.ticks * self.tick
+    
+    def advance(self, ticks: int = 1):
+        self.ticks += ticks
+
+
+class ManualClock:
+    """Clock for `Game` that only moves when advanced by an explicit dt."""
+    def __init__(self, now: float = 0.0):
+        self.now = now
+    
+    def __call__(self) -> float:
+        return self.now
+    
+    def advance(self, dt: float):
+        self.now += dt
+
+
+class Simulation:
+    """
+    Steps a `Game` without terminal input, rendering or sleeps.
+    Every step advances the game by exactly one tick of `tick` seconds.
+    """
+    def __init__(
+        self,
+        field: BaseField,
+        piece_generator: Callable[[], Iterator[Piece]],
+        tick: float = DEFAULT_TICK,
+        game_class: type[Game] = Game,
+    ):
+        self.clock = TickClock(tick)
+        self.game = game_class(field, piece_generator, clock=self.clock)
+    
+    @property
+    def ticks(self) -> int:
+        return self.clock.ticks
+    
+    def start(self):
+        self.game.start()
+    
+    def step(self, action: Action | None = None) -> bool:
+        """Advance one tick, return False once the game is over."""
+        if self.game.is_game_over:
+            return False
+        self.clock.advance()
+        self.game.process(self.clock.tick, action)
+        return not self.game.is_game_over
+    
+    def run(self, actions: Iterable[Action | None], max_ticks: int | None = None) -> Game:
+        """Feed one action per tick until actions run out, the game ends or `max_ticks` is hit."""
+        for action in actions:
+            if max_ticks is not None and self.ticks >= max_ticks:
+                break
+            if not self.step(action):
+                break
+        return self.game
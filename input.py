@@ -39,9 +39,40 @@ KEY_MAP = {
     'w': Action.ROTATE,
 }
 
+class KeyDecoder:
+    """Incremental decoder of terminal key input, escape sequences may span several reads."""
+    ESCAPE = '\x1b'
+    ESCAPE_LENGTH = 2  # chars following ESCAPE, e.g. '[A'
+    
+    def __init__(self):
+        self.pending = ''
+    
+    def feed(self, data: str) -> list[Action]:
+        """Return the actions of every complete key in `data`, in order."""
+        data = self.pending + data
+        self.pending = ''
+        actions = []
+        i = 0
+        while i < len(data):
+            ch = data[i]
+            if ch == self.ESCAPE:
+                if len(data) - i <= self.ESCAPE_LENGTH:
+                    self.pending = data[i:]
+                    break
+                action = KEY_MAP.get(data[i + 1:i + 1 + self.ESCAPE_LENGTH])
+                i += 1 + self.ESCAPE_LENGTH
+            else:
+                action = KEY_MAP.get(ch)
+                i += 1
+            if action:
+                actions.append(action)
+        return actions
+
+
 class Input:
     def __init__(self):
         """Put terminal into cbreak mode in Unix"""
+        self.decoder = KeyDecoder()
         if not sys.platform.startswith('win'):
             self.fd = sys.stdin.fileno()
             self.old_settings = termios.tcgetattr(self.fd)
@@ -68,11 +99,7 @@ class Input:
             return last
         else:
             while select.select([sys.stdin], [], [], 0)[0]:
-                ch = sys.stdin.read(1)
-                if ch == '\x1b':
-                    ch2 = sys.stdin.read(2)
-                    last = KEY_MAP.get(ch2, None)
-                else:
-                    last = KEY_MAP.get(ch, None)
+                for action in self.decoder.feed(sys.stdin.read(1)):
+                    last = action
             return last
             
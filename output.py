@@ -1,14 +1,50 @@
+import asyncio
 import os
 import sys
+from typing import Protocol
 
+CLEAR_SCREEN = "\033[2J\033[H"
+CLEAR_LINE_END = "\033[K"
+HIGH_WATER = 64 * 1024  # bytes queued on a connection beyond which frames are dropped
 
-def clear_screen():
+
+class Writer(Protocol):
+    """Text stream a `Renderer` writes frames to: anything with `write` and `flush`."""
+    def write(self, text: str, /) -> int: ...
+
+    def flush(self) -> None: ...
+
+
+def clear_screen(stream: Writer | None = None):
     """
     Clears the terminal screen in a cross-platform way.
     """
-    if sys.platform.startswith('win'):
+    if sys.platform.startswith('win') and stream in (None, sys.stdout):
         os.system('cls')  # For Windows
     else:
         # For Linux, macOS, and other Unix-like systems, ANSI escape sequence
-        print("\033[2J\033[H", end='')
+        print(CLEAR_SCREEN, end='', file=stream)
         
+
+def move_cursor(row: int, col: int) -> str:
+    """
+    ANSI sequence moving the cursor to 1-based (row, col).
+    """
+    return f"\033[{row};{col}H"
+
+
+def is_backed_up(writer: asyncio.StreamWriter) -> bool:
+    """
+    Whether the client of `writer` has fallen more than `HIGH_WATER` bytes
+    behind, in which case frames are dropped instead of queued.
+    """
+    return writer.transport.get_write_buffer_size() > HIGH_WATER
+
+
+class NullWriter(Writer):
+    """Text stream that discards everything, for timing renderers without a terminal."""
+    def write(self, text: str) -> int:
+        return len(text)
+
+    def flush(self) -> None:
+        pass
@@ -1,6 +1,11 @@
 import random
 
+from abc import ABC, abstractmethod
+from collections import deque
 from collections.abc import Iterator
+from copy import copy
+from itertools import islice
+from dataclasses import dataclass
 from enum import Enum, auto
 
 EMPTY = 0
@@ -46,45 +51,200 @@ SHAPES = {
     ],
 }
 
+ROTATIONS = 4
+
+@dataclass(frozen=True, slots=True)
+class Orientation:
+    """Precomputed data of a single rotation of a piece."""
+    shape: tuple[tuple[int, ...], ...]
+    cells: tuple[tuple[int, int], ...]  # (col, row) of occupied cells
+    row_masks: tuple[int, ...]          # bit N set when column N is occupied
+    width: int
+    height: int
+    bottom: tuple[int, ...]             # lowest occupied row per column, -1 if empty
+    min_col: int
+    max_col: int
+
+
+def _build_orientations(kind: PieceType) -> tuple[Orientation, ...]:
+    shape = [[kind.value if c else EMPTY for c in row] for row in SHAPES[kind]]
+    orientations = []
+    for _ in range(ROTATIONS):
+        cells = tuple(
+            (col_idx, row_idx)
+            for row_idx, row in enumerate(shape)
+            for col_idx, cell in enumerate(row)
+            if cell
+        )
+        width = len(shape[0])
+        orientations.append(Orientation(
+            shape = tuple(tuple(row) for row in shape),
+            cells = cells,
+            row_masks = tuple(sum(1 << col_idx for col_idx, cell in enumerate(row) if cell) for row in shape),
+            width = width,
+            height = len(shape),
+            bottom = tuple(max((r for c, r in cells if c == col), default=-1) for col in range(width)),
+            min_col = min(c for c, _ in cells),
+            max_col = max(c for c, _ in cells),
+        ))
+        # clockwise rotation
+        shape = [list(row) for row in zip(*shape[::-1])]
+    return tuple(orientations)
+
+
+ORIENTATIONS: dict[PieceType, tuple[Orientation, ...]] = {
+    kind: _build_orientations(kind) for kind in PieceType
+}
+
+
 class Piece:
-    def __init__(self, kind: PieceType, x: int = 0, y: int = 0):
+    __slots__ = ('kind', 'rotation', 'x', 'y')
+
+    def __init__(self, kind: PieceType, x: int = 0, y: int = 0, rotation: int = 0):
         self.kind = kind
-        self.shape = [
-            [kind.value if c else EMPTY for c in row]
-            for row in SHAPES[kind]
-        ]
-        
+        self.rotation = rotation
         self.x = x
         self.y = y
     
+    @property
+    def orientation(self) -> Orientation:
+        return ORIENTATIONS[self.kind][self.rotation]
+    
+    @property
+    def shape(self) -> tuple[tuple[int, ...], ...]:
+        return ORIENTATIONS[self.kind][self.rotation].shape
+    
     @property
     def width(self):
-        return max(len(row) for row in self.shape)
+        return ORIENTATIONS[self.kind][self.rotation].width
     
     @property
     def height(self):
-        return len(self.shape)
+        return ORIENTATIONS[self.kind][self.rotation].height
     
     @property
     def rotated(self):
         """Return new Piece with rotated shape (clockwise)"""
-        new_piece = Piece(
-            kind = self.kind,
-            x = self.x,
-            y = self.y
-        )
-        new_piece.shape = [list(row) for row in zip(*self.shape[::-1])]
-        return new_piece
+        return Piece(self.kind, self.x, self.y, (self.rotation + 1) % ROTATIONS)
+
+
+KINDS = tuple(PieceType)
+
+
+class PieceGenerator(ABC):
+    """
+    Seedable piece source with its own `random.Random`. Upcoming pieces can be
+    previewed through a queue without consuming them, the stream can be skipped
+    ahead or rewound to any piece index, and the whole state can be saved,
+    restored or forked.
+    """
+    def __init__(self, seed: int | None = None):
+        self.rng = random.Random()
+        self._queue: deque[PieceType] = deque()
+        self.reset(seed)
+    
+    def reset(self, seed: int | None = None):
+        """Start over with the pieces of `seed`, reusing this generator."""
+        self.seed = seed
+        self.rng.seed(seed)
+        self.index = 0  # index of the piece the next `next()` returns
+        self._queue.clear()
+        self._initial_state = self.getstate()
+    
+    def __iter__(self) -> Iterator[Piece]:
+        return self
+    
+    def __next__(self) -> Piece:
+        self.index += 1
+        return Piece(self._queue.popleft() if self._queue else self._draw())
+    
+    @abstractmethod
+    def _draw(self) -> PieceType:
+        """Kind of the next piece, drawn from `rng`."""
+    
+    def _skip_draws(self, count: int):
+        for _ in range(count):
+            self._draw()
+    
+    def peek(self, count: int) -> list[PieceType]:
+        """Kinds of the next `count` pieces, without consuming them."""
+        while len(self._queue) < count:
+            self._queue.append(self._draw())
+        return list(islice(self._queue, count))
+    
+    def skip(self, count: int):
+        """Advance `count` pieces without building them."""
+        queued = min(count, len(self._queue))
+        for _ in range(queued):
+            self._queue.popleft()
+        self._skip_draws(count - queued)
+        self.index += count
+    
+    def seek(self, index: int):
+        """Move to piece `index`, rewinding to the start first if needed."""
+        if index < self.index:
+            self.setstate(self._initial_state)
+        self.skip(index - self.index)
+    
+    def getstate(self) -> tuple:
+        return self.rng.getstate(), self.index, tuple(self._queue)
+    
+    def setstate(self, state: tuple):
+        rng_state, self.index, queue = state
+        self.rng.setstate(rng_state)
+        self._queue = deque(queue)
+    
+    def fork(self) -> 'PieceGenerator':
+        """Independent copy that continues with the same pieces."""
+        forked = copy(self)
+        forked.rng = random.Random(0)  # any cheap seed, replaced by setstate below
+        forked.setstate(self.getstate())
+        return forked
+
+
+class RandomPieceGenerator(PieceGenerator):
+    """Every piece is drawn uniformly at random."""
+    def _draw(self) -> PieceType:
+        return self.rng.choice(KINDS)
+
+
+class BagPieceGenerator(PieceGenerator):
+    """Deals shuffled bags holding one piece of every kind."""
+    def reset(self, seed: int | None = None):
+        self._bag: list[PieceType] = []
+        self._bag_pos = 0
+        super().reset(seed)
+    
+    def _draw(self) -> PieceType:
+        if self._bag_pos >= len(self._bag):
+            self._bag = list(KINDS)
+            self.rng.shuffle(self._bag)
+            self._bag_pos = 0
+        self._bag_pos += 1
+        return self._bag[self._bag_pos - 1]
+    
+    def _skip_draws(self, count: int):
+        # finish the current bag, then shuffle whole bags without dealing them
+        in_bag = min(count, len(self._bag) - self._bag_pos)
+        self._bag_pos += in_bag
+        count -= in_bag
+        scratch = list(KINDS)
+        while count >= len(KINDS):
+            self.rng.shuffle(scratch)
+            count -= len(KINDS)
+        super()._skip_draws(count)
+    
+    def getstate(self) -> tuple:
+        return super().getstate() + (tuple(self._bag), self._bag_pos)
+    
+    def setstate(self, state: tuple):
+        super().setstate(state[:3])
+        bag, self._bag_pos = state[3:]
+        self._bag = list(bag)
 
 
-def random_piece_generator() -> Iterator[Piece]:
-    while True:
-        yield Piece(random.choice(list(PieceType)))
+def random_piece_generator(seed: int | None = None) -> RandomPieceGenerator:
+    return RandomPieceGenerator(seed)
 
-def bag_piece_generator() -> Iterator[Piece]:
-    while True:
-        bag = list(PieceType)
-        random.shuffle(bag)
-        for piece_type in bag:
-            yield Piece(piece_type)
-            
+def bag_piece_generator(seed: int | None = None) -> BagPieceGenerator:
+    return BagPieceGenerator(seed)
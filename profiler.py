@@ -0,0 +1,248 @@
+import os
+import sys
+import tracemalloc
+from collections import Counter
+from math import log2
+from time import perf_counter
+
+from output import Writer
+
+
+class Histogram:
+    """
+    Log-bucketed histogram of non-negative samples, constant memory however
+    long the game runs. Percentiles are accurate to about 9%.
+    """
+    BUCKETS_PER_OCTAVE = 8
+
+    def __init__(self, scale: float = 1e9):
+        self.scale = scale  # samples are bucketed in units of 1/scale (ns for seconds)
+        self.buckets: Counter[int] = Counter()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        scaled = value * self.scale
+        self.buckets[int(log2(scaled) * self.BUCKETS_PER_OCTAVE) if scaled >= 1 else -1] += 1
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p: float) -> float:
+        """Value below which `p` percent of the samples fall."""
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                break
+        if bucket < 0:
+            return 0.0
+        return min(self.max, 2 ** ((bucket + 0.5) / self.BUCKETS_PER_OCTAVE) / self.scale)
+
+
+class CountingWriter:
+    """Text stream wrapper counting the bytes written through it."""
+    def __init__(self, stream: Writer):
+        self.stream = stream
+        self.bytes_written = 0
+        self.writes = 0
+
+    def write(self, text: str) -> int:
+        self.bytes_written += len(text.encode())
+        self.writes += 1
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class Profiler:
+    """
+    Per-frame instrumentation of input, game update and rendering.
+
+    `attach` wraps the instance methods of the given objects with timers, so
+    nothing is measured (or slowed down) unless a profiler is attached.
+    Call `end_frame` once per rendered frame: the time each section took
+    during the frame is added to its histogram.
+    """
+    SECTIONS = ('input', 'transitions', 'action', 'physics', 'render', 'frame')
+    PERCENTILES = (50, 95, 99)
+    SIDEBAR_INTERVAL = 0.5  # seconds between debug sidebar refreshes
+
+    def __init__(self, trace_allocations: bool = False, report_path: str | None = None, clock=perf_counter):
+        self.clock = clock
+        self.report_path = report_path
+        self.histograms = {section: Histogram() for section in self.SECTIONS}
+        self.bytes_per_frame = Histogram(scale=1)
+        self.blocks_per_frame = Histogram(scale=1)  # blocks allocated in a frame and still alive at its end
+        self.frames = 0
+        self.trace_allocations = trace_allocations
+        self.scheduler = None
+        self.renderer = None
+        self.writer: CountingWriter | None = None
+        self._frame: dict[str, float] = dict.fromkeys(self.SECTIONS, 0.0)
+        self._frame_started = clock()
+        self._bytes_at_frame_start = 0
+        self._sidebar_updated = 0.0
+        self._allocations: tracemalloc.Snapshot | None = None
+        if trace_allocations:
+            tracemalloc.start()
+            self._allocations = self._take_snapshot()
+
+    def attach(self, game=None, key_reader=None, renderer=None, scheduler=None):
+        """Instrument the given objects in place."""
+        if game is not None:
+            self._wrap(game, '_process_state_transitions', 'transitions')
+            self._wrap(game, '_process_action', 'action')
+            self._wrap(game, '_process_physics', 'physics')
+        if key_reader is not None:
+            self._wrap(key_reader, 'get_action', 'input')
+        if renderer is not None:
+            self._wrap(renderer, 'draw', 'render')
+            self._wrap(renderer, 'draw_message', 'render')
+            self._wrap(renderer, 'draw_field', 'render')
+            self.writer = CountingWriter(renderer.out)
+            renderer.out = self.writer
+            self.renderer = renderer
+        if scheduler is not None:
+            self.scheduler = scheduler
+
+    def _wrap(self, obj, name: str, section: str):
+        method = getattr(obj, name)
+        clock = self.clock
+        frame = self._frame
+
+        def timed(*args, **kwargs):
+            started = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                frame[section] += clock() - started
+
+        setattr(obj, name, timed)
+
+    def end_frame(self):
+        """Close the current frame and start measuring the next one."""
+        now = self.clock()
+        frame = self._frame
+        frame['frame'] = now - self._frame_started
+        self._frame_started = now
+        for section, elapsed in frame.items():
+            self.histograms[section].add(elapsed)
+            frame[section] = 0.0
+        self.frames += 1
+
+        if self.writer:
+            self.bytes_per_frame.add(self.writer.bytes_written - self._bytes_at_frame_start)
+            self._bytes_at_frame_start = self.writer.bytes_written
+        if self.trace_allocations:
+            allocations = self._take_snapshot()
+            new_blocks = sum(
+                stat.count_diff for stat in allocations.compare_to(self._allocations, 'lineno')
+                if stat.count_diff > 0
+            )
+            self.blocks_per_frame.add(new_blocks)
+            self._allocations = allocations
+
+        if self.renderer and now - self._sidebar_updated >= self.SIDEBAR_INTERVAL:
+            self._sidebar_updated = now
+            self.renderer.debug_text = self.sidebar_text()
+
+    @staticmethod
+    def _take_snapshot() -> tracemalloc.Snapshot:
+        """Traced blocks still alive, minus the profiler's and tracemalloc's own."""
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ])
+
+    def sidebar_text(self) -> str:
+        """One-line summary for the debug sidebar line."""
+        frame = self.histograms['frame']
+        render = self.histograms['render']
+        update = sum(self.histograms[s].mean for s in ('transitions', 'action', 'physics'))
+        return (
+            f"fps {1 / frame.mean if frame.mean else 0:.0f} "
+            f"p95 {render.percentile(95) * 1e3:.1f}ms "
+            f"upd {update * 1e3:.2f}ms"
+        )
+
+    def report(self) -> str:
+        headers = [f'p{p}' for p in self.PERCENTILES]
+        lines = [
+            f"frames: {self.frames}",
+            f"{'section':12}{'mean':>10}" + ''.join(f'{header:>10}' for header in headers) + f"{'max':>10}  (ms)",
+        ]
+        for section, histogram in self.histograms.items():
+            values = [histogram.mean, *(histogram.percentile(p) for p in self.PERCENTILES), histogram.max]
+            lines.append(f"{section:12}" + ''.join(f'{value * 1e3:10.3f}' for value in values))
+
+        counters = [('bytes/frame', self.bytes_per_frame)]
+        if self.trace_allocations:
+            counters.append(('blocks/frame', self.blocks_per_frame))
+        for name, histogram in counters:
+            values = [histogram.mean, *(histogram.percentile(p) for p in self.PERCENTILES), histogram.max]
+            lines.append(f"{name:12}" + ''.join(f'{value:10.0f}' for value in values))
+        if self.writer:
+            lines.append(f"bytes written: {self.writer.bytes_written} in {self.writer.writes} writes")
+
+        if self.scheduler:
+            stats = self.scheduler.stats
+            lines.append(
+                f"scheduler: {stats.ticks} ticks, {stats.frames} frames, "
+                f"{stats.skipped_frames} skipped frames, {stats.dropped_ticks} dropped ticks"
+            )
+        if self.trace_allocations:
+            lines.append("top allocation sites (blocks):")
+            statistics = self._take_snapshot().statistics('lineno')
+            for stat in sorted(statistics, key=lambda stat: stat.count, reverse=True)[:10]:
+                frame = stat.traceback[0]
+                lines.append(f"  {stat.count:8} {stat.size:10} B  {frame.filename}:{frame.lineno}")
+        return '\n'.join(lines)
+
+    def dump(self):
+        """Write the report to `report_path`, or stderr."""
+        text = self.report() + '\n'
+        if self.report_path:
+            with open(self.report_path, 'w') as f:
+                f.write(text)
+        else:
+            sys.stderr.write(text)
+
+
+class NullProfiler:
+    """Stand-in used when profiling is off, every hook is a no-op."""
+    def attach(self, game=None, key_reader=None, renderer=None, scheduler=None):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def dump(self):
+        pass
+
+
+def profiler_from_env(environ=os.environ) -> Profiler | NullProfiler:
+    """
+    `TETRIS_PROFILE` turns profiling on, its value is the report path
+    ('1' or '-' for stderr). `TETRIS_PROFILE_ALLOC=1` also traces allocations.
+    """
+    path = environ.get('TETRIS_PROFILE')
+    if not path:
+        return NullProfiler()
+    return Profiler(
+        trace_allocations=bool(environ.get('TETRIS_PROFILE_ALLOC')),
+        report_path=None if path in ('1', '-') else path,
+    )
@@ -1,18 +1,26 @@
-from copy import deepcopy
-from time import sleep
+import sys
+from collections.abc import Sequence
 
-from output import clear_screen
+from output import Writer, clear_screen, move_cursor, CLEAR_SCREEN, CLEAR_LINE_END
 from colors import Colorizer
-from pieces import Piece, PieceType
-from snapshot import GameSnapshot, FieldSnapshot
+from pieces import PieceType, ORIENTATIONS
+from snapshot import GameSnapshot
 
 
 class Renderer:
+    """
+    Renders the field and sidebar. Each frame is composed into a reusable
+    buffer and written with a single call. Static parts are rendered once:
+    borders, cell strings, preview boxes. Field rows are re-rendered only
+    when their snapshot row object changes.
+    """
     MSG_PADDING_CHAR = ' '
     W_BORDER_CHAR = "|"
+    SIDEBAR_PADDING = '   '
     LEVEL_LINE = 1
     SCORE_LINE = 2
     TIME_LINE = 18
+    DEBUG_LINE = 16
     PREVIEW_BOX_START_LINE = 4
     PREVIEW_BOX_SIZE = 4
     PREVIEW_BOX_END_LINE = PREVIEW_BOX_START_LINE + PREVIEW_BOX_SIZE
@@ -20,9 +28,11 @@ class Renderer:
     GHOST_CHAR = "@"
     BLOCK_CHAR = "@"
 
-    def __init__(self, width: int, height: int):
+    def __init__(self, width: int, height: int, out: Writer | None = None):
         self.width = width
         self.height = height
+        self._out = out
+        self.debug_text: str | None = None  # shown in the sidebar when set, e.g. by a Profiler
         self.colorizer = Colorizer()
         self.Colors = {
             PieceType.I.value: self.colorizer.cyan,
@@ -36,6 +46,34 @@ class Renderer:
         self.chars = {
             piece_type: f'{color}{self.BLOCK_CHAR}{self.colorizer.reset}' for piece_type, color in self.Colors.items()
         }
+        # cell string by cell value, 0 is empty
+        self._cells = tuple(self.chars.get(value, ' ') for value in range(max(self.chars) + 1))
+        
+        # pre-rendered static parts
+        self._clear = '' if self.colorizer.is_windows else CLEAR_SCREEN
+        self._border_line = f'+{"-" * width}+\n'
+        self._empty_line = f'{self.W_BORDER_CHAR}{" " * width}{self.W_BORDER_CHAR}\n'
+        self._empty_preview = (self.SIDEBAR_PADDING + ' ' * self.PREVIEW_BOX_SIZE,) * self.PREVIEW_BOX_SIZE
+        self._previews = {kind: self._render_preview(kind) for kind in PieceType}
+        
+        # buffers reused by every frame
+        self._grid_rows: list[tuple[int, ...] | None] = [None] * height  # snapshot rows last rendered
+        self._base_rows: list[list[str]] = [[] for _ in range(height)]
+        self._base_text: list[str] = [''] * height
+        self._rows: list[list[str]] = [[] for _ in range(height)]
+        self._row_text: list[str] = [''] * height
+        self._sidebar: list[str] = [''] * max(height, self.TIME_LINE + 1, self.DEBUG_LINE + 1, self.PREVIEW_BOX_END_LINE)
+        self._no_sidebar: list[str] = [''] * height
+        self._frame: list[str] = [''] * (height + 2)
+    
+    @property
+    def out(self) -> Writer:
+        """Stream the frames are written to, stdout unless given."""
+        return self._out if self._out is not None else sys.stdout
+    
+    @out.setter
+    def out(self, stream: Writer | None):
+        self._out = stream
     
     @property
     def half_height(self):
@@ -44,62 +82,73 @@ class Renderer:
     # --- Public API ---   
     def draw(self, snapshot: GameSnapshot):
         """Draw the whole field + sidebar."""
-        field_representation = self._get_field_representation(snapshot.field.grid)
-        
-        if snapshot.current_piece:
-            for row_idx, row in enumerate(snapshot.current_piece.shape):
-                for col_idx, cell in enumerate(row):
-                    if cell:
-                        # overlay ghost piece first
-                        gx = snapshot.current_piece.x + col_idx
-                        gy = snapshot.ghost_y + row_idx
-                        if 0 <= gy < self.height and 0 <= gx < self.width:
-                            field_representation[gy][gx] = self._get_cell_representation(cell, is_ghost=True)
-                        
-                        # overlay current piece (on top of ghost if overlap)
-                        x = snapshot.current_piece.x + col_idx
-                        y = snapshot.current_piece.y + row_idx
-                        if 0 <= y < self.height and 0 <= x < self.width:
-                            field_representation[y][x] = self._get_cell_representation(cell)
-        
-        self._print_field(field_representation, snapshot)
+        self._compose_field(snapshot)
+        self._print_field(self._rows, snapshot, self._row_text)
 
     def draw_message(self, text: str):
         """Center a message inside the playfield."""
-        clear_screen()
-        self._print_horizontal_border()
-        self._print_empty_rows(self.half_height - 1, self.width)
-        self._print_msg(text)
-        self._print_empty_rows(self.half_height - 1, self.width)
-        self._print_horizontal_border()
+        empty_rows = self._empty_line * (self.half_height - 1)
+        self._write_frame(''.join((
+            self._clear, self._border_line,
+            empty_rows, self._get_msg_line(text), empty_rows,
+            self._border_line,
+        )))
 
-    def draw_game_over(self, snapshot, sleep_time=0.05):
+    def draw_field(
+        self,
+        field_cells: Sequence[Sequence[str]],
+        snapshot: GameSnapshot | None = None,
+        row_text: list[str] | None = None,
+    ):
         """
-        Fill the field row by row with '#', then empty it back to the snapshot.
-        Sidebar is preserved because snapshot is used for the 'emptying' phase.
+        Draw prepared field cells (one string per cell, e.g. from an animation)
+        with the sidebar of `snapshot`. `row_text` holds the joined rows when
+        the caller keeps them.
         """
-        field_representation = self._get_field_representation(snapshot.field.grid)
-        old_field = []
-        
-        # FILL PHASE
-        for y in reversed(range(self.height)):
-            old_field.insert(0, field_representation[y])
-            field_representation[y] = ["#"] * self.width
-            self._print_field(field_representation, snapshot)
-            sleep(sleep_time)
+        self._print_field(field_cells, snapshot, row_text)
 
-        # EMPTY PHASE (restore snapshot gradually)
-        for y in range(self.height):
-            field_representation[y] = old_field[y][:]
-            self._print_field(field_representation, snapshot)
-            sleep(sleep_time)
+    def field_cells(self, grid) -> list[tuple[str, ...]]:
+        """Cell strings of a snapshot grid, without pieces."""
+        cells = self._cells
+        return [tuple(cells[cell] for cell in row) for row in grid]
+
+    def message_cells(self, text: str) -> list[tuple[str, ...]]:
+        """Cell strings of an empty field with `text` centered, like `draw_message`."""
+        empty = (' ',) * self.width
+        rows = [empty] * self.height
+        rows[self.half_height - 1] = tuple(self._get_msg_line(text)[1:self.width + 1])
+        return rows
 
     # --- Internal helpers ---
-    def _get_field_representation(self, field_grid: list[list[int]]) -> list[list[str]]:
-        return [
-            [self._get_cell_representation(cell) for cell in row]
-            for row in field_grid
-        ]
+    def _compose_field(self, snapshot: GameSnapshot):
+        """Fill `_rows` / `_row_text` with the field, ghost and current piece."""
+        cells = self._cells
+        grid_rows, base_rows, base_text = self._grid_rows, self._base_rows, self._base_text
+        rows, row_text = self._rows, self._row_text
+        for y, row in enumerate(snapshot.field.grid):
+            if row is not grid_rows[y]:
+                grid_rows[y] = row
+                base_rows[y] = [cells[cell] for cell in row]
+                base_text[y] = ''.join(base_rows[y])
+            rows[y] = base_rows[y]
+            row_text[y] = base_text[y]
+        
+        piece = snapshot.current_piece
+        if not piece:
+            return
+        touched = set()
+        # ghost first, the current piece is drawn on top of it
+        for top, char in ((snapshot.ghost_y, self.GHOST_CHAR), (piece.y, cells[piece.kind.value])):
+            for col_idx, row_idx in piece.orientation.cells:
+                x = piece.x + col_idx
+                y = top + row_idx
+                if 0 <= y < self.height and 0 <= x < self.width:
+                    if rows[y] is base_rows[y]:
+                        rows[y] = base_rows[y][:]
+                        touched.add(y)
+                    rows[y][x] = char
+        for y in touched:
+            row_text[y] = ''.join(rows[y])
     
     def _get_cell_representation(self, cell: int, is_ghost=False) -> str:
         if is_ghost:
@@ -109,68 +158,151 @@ class Renderer:
             # block char with pre-applied color or empty space
             return self.chars.get(cell, ' ')
     
-    def _print_field(self, field_representation: list[list[str]], snapshot: GameSnapshot | None = None):
-        clear_screen()
-        
-        self._print_horizontal_border()
-        if snapshot: # need to render sidebar
-            for row_idx, row in enumerate(field_representation):
-                print(f'{self.W_BORDER_CHAR}{"".join(row)}{self.W_BORDER_CHAR}{self._get_sidebar_line(row_idx, snapshot)}')
-        else: # just render field
-            for row in field_representation:
-                print(f'{self.W_BORDER_CHAR}{"".join(row)}{self.W_BORDER_CHAR}')
-        self._print_horizontal_border()
+    def _print_field(
+        self,
+        field_representation: Sequence[Sequence[str]],
+        snapshot: GameSnapshot | None = None,
+        row_text: list[str] | None = None,
+    ):
+        sidebar = self._get_sidebar(snapshot) if snapshot else self._no_sidebar
+        if row_text is None:
+            row_text = [''.join(row) for row in field_representation]
+        self._write_frame(self._get_full_frame(row_text, sidebar))
+    
+    def _get_full_frame(self, row_text: list[str], sidebar: list[str]) -> str:
+        frame = self._frame
+        border = self.W_BORDER_CHAR
+        frame[0] = self._clear + self._border_line
+        for y in range(self.height):
+            frame[y + 1] = f'{border}{row_text[y]}{border}{sidebar[y]}\n'
+        frame[-1] = self._border_line
+        return ''.join(frame)
+    
+    def _write_frame(self, frame: str):
+        if self.colorizer.is_windows:
+            clear_screen(self.out)
+        self.out.write(frame)
+        self.out.flush()
         
-    def _get_sidebar_line(self, idx, snapshot):
-        padding = '   '
-        sidebar_map = {
-            self.LEVEL_LINE: f"{padding}level: {snapshot.level}",
-            self.SCORE_LINE: f"{padding}score: {snapshot.score}",
-            self.TIME_LINE: f"{padding}time: {snapshot.playtime:.1f}s",
-        }
-        if idx in sidebar_map:
-            return sidebar_map[idx]
-        elif self.PREVIEW_BOX_START_LINE <= idx < self.PREVIEW_BOX_END_LINE:
-            pj = idx - self.PREVIEW_BOX_START_LINE
-            return f'{padding}{self._get_preview_row(pj, snapshot.next_piece)}'
-        else:
-            return ''
-
-    def _get_preview_row(self, j: int, piece: Piece | None):
-        """Return the j-th row of the preview box with the piece centered."""
-        if not piece:
-            return " " * self.PREVIEW_BOX_SIZE
-
-        # top offset to center vertically
-        top_padding = (self.PREVIEW_BOX_SIZE - piece.height) // 2
-        # left offset to center horizontally
-        left_padding = (self.PREVIEW_BOX_SIZE - piece.width) // 2
-
-        # if j is outside the piece's vertical bounds → empty row
-        if not (top_padding <= j < top_padding + piece.height):
-            return " " * self.PREVIEW_BOX_SIZE
+    def _get_sidebar(self, snapshot: GameSnapshot) -> list[str]:
+        """Sidebar line for every field row, in a buffer reused across frames."""
+        sidebar = self._sidebar
+        padding = self.SIDEBAR_PADDING
+        sidebar[self.LEVEL_LINE] = f"{padding}level: {snapshot.level}"
+        sidebar[self.SCORE_LINE] = f"{padding}score: {snapshot.score}"
+        sidebar[self.TIME_LINE] = f"{padding}time: {snapshot.playtime:.1f}s"
+        sidebar[self.DEBUG_LINE] = f"{padding}{self.debug_text}" if self.debug_text else ''
+        piece = snapshot.next_piece
+        preview = self._previews[piece.kind] if piece else self._empty_preview
+        sidebar[self.PREVIEW_BOX_START_LINE:self.PREVIEW_BOX_END_LINE] = preview
+        return sidebar
 
-        # row inside the piece
-        piece_row = piece.shape[j - top_padding]
-        out = [" "] * self.PREVIEW_BOX_SIZE
-
-        for x, cell in enumerate(piece_row):
-            if cell and left_padding + x < self.PREVIEW_BOX_SIZE:
-                out[left_padding + x] = self._get_cell_representation(cell)
-
-        return "".join(out)
-
-    def _print_empty_rows(self, times, width):
-        for _ in range(times):
-            print(f'{self.W_BORDER_CHAR}{" " * width}{self.W_BORDER_CHAR}')
-
-    def _print_horizontal_border(self):
-        print(f'+{"-" * self.width}+')
+    def _render_preview(self, kind: PieceType) -> tuple[str, ...]:
+        """Preview box rows with the piece centered."""
+        orientation = ORIENTATIONS[kind][0]
+        shape, height, width = orientation.shape, orientation.height, orientation.width
+        top_padding = (self.PREVIEW_BOX_SIZE - height) // 2
+        left_padding = (self.PREVIEW_BOX_SIZE - width) // 2
+        
+        rows = []
+        for j in range(self.PREVIEW_BOX_SIZE):
+            out = [" "] * self.PREVIEW_BOX_SIZE
+            if top_padding <= j < top_padding + height:
+                for x, cell in enumerate(shape[j - top_padding]):
+                    if cell and left_padding + x < self.PREVIEW_BOX_SIZE:
+                        out[left_padding + x] = self._get_cell_representation(cell)
+            rows.append(self.SIDEBAR_PADDING + "".join(out))
+        return tuple(rows)
     
-    def _print_msg(self, msg: str):
+    def _get_msg_line(self, msg: str) -> str:
         padding = (self.width // 2 - len(msg) // 2)
         padding_left = self.MSG_PADDING_CHAR * padding
         padding_right = self.MSG_PADDING_CHAR * (self.width - padding - len(msg))
         
-        print(f'{self.W_BORDER_CHAR}{padding_left}{msg}{padding_right}{self.W_BORDER_CHAR}')
+        return f'{self.W_BORDER_CHAR}{padding_left}{msg}{padding_right}{self.W_BORDER_CHAR}\n'
 
+
+
+class DiffRenderer(Renderer):
+    """
+    Renderer that remembers the last drawn frame and only emits the cells and
+    sidebar lines that changed, as one batched write of cursor-positioning
+    escape sequences. Unchanged frames are not drawn at all.
+    """
+    FIELD_TOP_ROW = 2   # terminal row of field row 0 (below the top border)
+    FIELD_LEFT_COL = 2  # terminal column of field column 0 (after the left border)
+
+    def __init__(self, width: int, height: int, out: Writer | None = None):
+        super().__init__(width, height, out)
+        self.sidebar_col = self.FIELD_LEFT_COL + self.width + len(self.W_BORDER_CHAR)
+        self._last_field: Sequence[Sequence[str]] | None = None
+        self._last_text: list[str] = []
+        self._last_sidebar: list[str] = []
+    
+    def invalidate(self):
+        """Forget the last frame so the next draw repaints everything."""
+        self._last_field = None
+    
+    def draw_message(self, text: str):
+        super().draw_message(text)
+        self.invalidate()
+    
+    def _print_field(
+        self,
+        field_representation: Sequence[Sequence[str]],
+        snapshot: GameSnapshot | None = None,
+        row_text: list[str] | None = None,
+    ):
+        if self.colorizer.is_windows: # no ANSI cursor addressing
+            super()._print_field(field_representation, snapshot, row_text)
+            return
+        
+        sidebar = self._get_sidebar(snapshot) if snapshot else self._no_sidebar
+        if row_text is None:
+            row_text = [''.join(row) for row in field_representation]
+        
+        last_field = self._last_field
+        if last_field is None:
+            frame = self._get_full_frame(row_text, sidebar)
+        else:
+            frame = self._get_frame_diff(field_representation, last_field, row_text, sidebar)
+        
+        # rows are never modified in place once composed, keeping references is enough
+        self._last_field = field_representation[:]
+        self._last_text = row_text[:]
+        self._last_sidebar = sidebar[:self.height]
+        if frame:
+            self._write_frame(frame)
+    
+    def _get_frame_diff(
+        self, field_representation: Sequence[Sequence[str]], last_field: Sequence[Sequence[str]], row_text: list[str], sidebar: list[str],
+    ) -> str:
+        out = []
+        for row_idx, text in enumerate(row_text):
+            if text == self._last_text[row_idx]:
+                continue
+            row = field_representation[row_idx]
+            last_row = last_field[row_idx]
+            # emit runs of adjacent changed cells behind a single cursor move
+            col_idx = 0
+            while col_idx < self.width:
+                if row[col_idx] == last_row[col_idx]:
+                    col_idx += 1
+                    continue
+                run_start = col_idx
+                while col_idx < self.width and row[col_idx] != last_row[col_idx]:
+                    col_idx += 1
+                out.append(move_cursor(self.FIELD_TOP_ROW + row_idx, self.FIELD_LEFT_COL + run_start))
+                out.append("".join(row[run_start:col_idx]))
+        
+        last_sidebar = self._last_sidebar
+        for row_idx in range(self.height):
+            line = sidebar[row_idx]
+            if line != last_sidebar[row_idx]:
+                out.append(move_cursor(self.FIELD_TOP_ROW + row_idx, self.sidebar_col))
+                out.append(line + CLEAR_LINE_END)
+        
+        if out:
+            # park the cursor below the bottom border
+            out.append(move_cursor(self.FIELD_TOP_ROW + self.height + 1, 1))
+        return "".join(out)
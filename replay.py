@@ -0,0 +1,312 @@
+import struct
+from collections.abc import Callable, Iterator
+
+from input import Action
+from pieces import Piece, PieceType
+from field import BaseField, BitboardField
+from game import Game, GameState
+from headless import ManualClock
+from renderer import Renderer
+
+MAGIC = b'TRPL'
+VERSION = 1
+TICKS_PER_SECOND = 1_000_000  # dt is stored in whole microseconds
+
+# Record tags
+END = 0x00
+RUN = 0x01          # varint count, varint dt: `count` ticks without action
+ACTION = 0x02       # byte action, varint dt: one tick with an action
+PIECE = 0x03        # byte kind: piece drawn from the piece generator
+CHECKPOINT = 0x04   # varint tick, varint pieces drawn, varint size, state blob
+
+NO_ACTION = 0
+NO_STATE = 0
+_FLOATS = struct.Struct('<4d')
+
+
+# --- Encoding helpers ---
+def write_varint(buf: bytearray, value: int):
+    while value >= 0x80:
+        buf.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+def read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+def zigzag(value: int) -> int:
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+def unzigzag(value: int) -> int:
+    return value // 2 if not value & 1 else -(value + 1) // 2
+
+
+def write_game(buf: bytearray, game: Game):
+    """Pack the field, pieces, counters and states of `game`, everything but its times."""
+    for row in game.field.snapshot.grid:
+        buf.extend(row)
+    piece = game.current_piece
+    buf.append(piece.kind.value if piece else 0)
+    buf.append(piece.rotation if piece else 0)
+    write_varint(buf, zigzag(piece.x if piece else 0))
+    write_varint(buf, zigzag(piece.y if piece else 0))
+    buf.append(game.next_piece.kind.value if game.next_piece else 0)
+    write_varint(buf, game.score)
+    write_varint(buf, game.cleared_lines)
+    write_varint(buf, game.level)
+    write_varint(buf, game.pieces_placed)
+    buf.append(game._current_state.value)
+    buf.append(game._prev_state.value if game._prev_state else NO_STATE)
+
+def read_game(game: Game, blob: bytes, pos: int = 0) -> int:
+    """Load what `write_game` packed at `pos` into `game`, return the position after it."""
+    width, height = game.field.width, game.field.height
+    game.field.load([blob[pos + y * width:pos + (y + 1) * width] for y in range(height)])
+    pos += width * height
+    kind, rotation = blob[pos], blob[pos + 1]
+    x, pos = read_varint(blob, pos + 2)
+    y, pos = read_varint(blob, pos)
+    game.current_piece = Piece(PieceType(kind), unzigzag(x), unzigzag(y), rotation) if kind else None
+    game.next_piece = Piece(PieceType(blob[pos])) if blob[pos] else None
+    game.score, pos = read_varint(blob, pos + 1)
+    game.cleared_lines, pos = read_varint(blob, pos)
+    game.level, pos = read_varint(blob, pos)
+    game.pieces_placed, pos = read_varint(blob, pos)
+    game._current_state = GameState(blob[pos])
+    game._prev_state = GameState(blob[pos + 1]) if blob[pos + 1] else None
+    return pos + 2
+
+
+def encode_state(game: Game) -> bytes:
+    """Pack the game state a replay needs to resume from a checkpoint."""
+    buf = bytearray()
+    write_game(buf, game)
+    buf.extend(_FLOATS.pack(game._next_state_timer, game._physics_acc, game.clock(), game.game_started_at))
+    return bytes(buf)
+
+def decode_state(game: Game, clock: ManualClock, blob: bytes):
+    """Load a state packed by `encode_state` into `game`."""
+    pos = read_game(game, blob)
+    game._next_state_timer, game._physics_acc, clock.now, game.game_started_at = _FLOATS.unpack_from(blob, pos)
+
+
+class _RecordedPieces:
+    """Wraps a piece generator, logging every drawn piece to the recorder."""
+    def __init__(self, recorder: 'Recorder', piece_gen: Iterator[Piece]):
+        self.recorder = recorder
+        self.piece_gen = piece_gen
+
+    def __iter__(self) -> Iterator[Piece]:
+        return self
+
+    def __next__(self) -> Piece:
+        piece = next(self.piece_gen)
+        self.recorder.buf.append(PIECE)
+        self.recorder.buf.append(piece.kind.value)
+        self.recorder.pieces_drawn += 1
+        return piece
+
+    def __getattr__(self, name):
+        # peek(), getstate() etc. of seedable generators
+        return getattr(self.piece_gen, name)
+
+
+class Recorder:
+    """
+    Records a game into the compact replay format as the game's `hook` and by
+    wrapping its piece generator. Attach before `game.start()`.
+
+    The game clock is replaced by one driven by the recorded dt (rounded to
+    whole microseconds), so playback reproduces the game exactly.
+    """
+    def __init__(self, game: Game, seed: int | None = None, checkpoint_every: int = 100):
+        self.game = game
+        self.checkpoint_every = checkpoint_every
+        self.clock = ManualClock()
+        self.buf = bytearray(MAGIC)
+        self.buf.append(VERSION)
+        write_varint(self.buf, game.field.width)
+        write_varint(self.buf, game.field.height)
+        write_varint(self.buf, seed + 1 if seed is not None else 0)
+
+        self.ticks = 0
+        self.pieces_drawn = 0
+        self.pieces_spawned = 0
+        self._run_count = 0
+        self._run_dt = 0
+        self._checkpoint_due = False
+
+        game.clock = self.clock
+        game.game_started_at = self.clock()
+        game.piece_gen = _RecordedPieces(self, game.piece_gen)
+        game.hook = self
+
+    def before_process(self, dt: float, action: Action | None) -> float:
+        dt_ticks = round(dt * TICKS_PER_SECOND)
+        if action:
+            self._flush_run()
+            self.buf.append(ACTION)
+            self.buf.append(action.value)
+            write_varint(self.buf, dt_ticks)
+        elif self._run_count and dt_ticks == self._run_dt:
+            self._run_count += 1
+        else:
+            self._flush_run()
+            self._run_count, self._run_dt = 1, dt_ticks
+
+        dt = dt_ticks / TICKS_PER_SECOND
+        self.clock.advance(dt)
+        return dt
+
+    def after_process(self):
+        self.ticks += 1
+        if self._checkpoint_due:
+            self._checkpoint_due = False
+            self._write_checkpoint()
+
+    def after_spawn(self):
+        self.pieces_spawned += 1
+        if self.ticks and self.pieces_spawned % self.checkpoint_every == 0:
+            self._checkpoint_due = True
+
+    def _flush_run(self):
+        if self._run_count:
+            self.buf.append(RUN)
+            write_varint(self.buf, self._run_count)
+            write_varint(self.buf, self._run_dt)
+            self._run_count = 0
+
+    def _write_checkpoint(self):
+        self._flush_run()
+        state = encode_state(self.game)
+        self.buf.append(CHECKPOINT)
+        write_varint(self.buf, self.ticks)
+        write_varint(self.buf, self.pieces_drawn)
+        write_varint(self.buf, len(state))
+        self.buf.extend(state)
+
+    def to_bytes(self) -> bytes:
+        self._flush_run()
+        out = bytearray(self.buf)
+        out.append(END)
+        write_varint(out, self.game.score)
+        write_varint(out, self.game.cleared_lines)
+        write_varint(out, self.game.level)
+        write_varint(out, self.ticks)
+        return bytes(out)
+
+    def save(self, path: str):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+
+class Replay:
+    """
+    Parsed replay that re-drives a headless `Game` at full speed, optionally
+    drawing every tick through a `Renderer`.
+    """
+    def __init__(self, data: bytes, field_factory: Callable[[int, int], BaseField] = BitboardField):
+        if data[:4] != MAGIC or data[4] != VERSION:
+            raise ValueError("not a replay file")
+        self.field_factory = field_factory
+        self.width, pos = read_varint(data, 5)
+        self.height, pos = read_varint(data, pos)
+        seed, pos = read_varint(data, pos)
+        self.seed = seed - 1 if seed else None
+
+        self.pieces: list[PieceType] = []
+        self.dts: list[int] = []  # per tick, in µs
+        self.actions: list[int] = []
+        self.checkpoints: list[tuple[int, int, bytes]] = []
+        self.final: tuple[int, int, int] | None = None
+
+        while pos < len(data):
+            tag = data[pos]
+            pos += 1
+            if tag == RUN:
+                count, pos = read_varint(data, pos)
+                dt, pos = read_varint(data, pos)
+                self.dts.extend([dt] * count)
+                self.actions.extend([NO_ACTION] * count)
+            elif tag == ACTION:
+                action = data[pos]
+                dt, pos = read_varint(data, pos + 1)
+                self.dts.append(dt)
+                self.actions.append(action)
+            elif tag == PIECE:
+                self.pieces.append(PieceType(data[pos]))
+                pos += 1
+            elif tag == CHECKPOINT:
+                tick, pos = read_varint(data, pos)
+                pieces_drawn, pos = read_varint(data, pos)
+                size, pos = read_varint(data, pos)
+                self.checkpoints.append((tick, pieces_drawn, data[pos:pos + size]))
+                pos += size
+            elif tag == END:
+                score, pos = read_varint(data, pos)
+                lines, pos = read_varint(data, pos)
+                level, pos = read_varint(data, pos)
+                _, pos = read_varint(data, pos)
+                self.final = (score, lines, level)
+            else:
+                raise ValueError(f"unknown replay record {tag:#x}")
+
+    @classmethod
+    def load(cls, path: str, field_factory: Callable[[int, int], BaseField] = BitboardField) -> 'Replay':
+        with open(path, 'rb') as f:
+            return cls(f.read(), field_factory)
+
+    def _new_game(self, pieces_drawn: int = 0) -> tuple[Game, ManualClock]:
+        clock = ManualClock()
+        pieces = self.pieces[pieces_drawn:]
+        game = Game(
+            self.field_factory(self.width, self.height),
+            lambda: (Piece(kind) for kind in pieces),
+            clock=clock,
+        )
+        return game, clock
+
+    def seek(self, tick: int) -> Game:
+        """Return the game as it was after `tick` ticks, starting from the nearest checkpoint."""
+        tick = min(tick, len(self.dts))
+        start = 0
+        for checkpoint_tick, pieces_drawn, state in self.checkpoints:
+            if checkpoint_tick > tick:
+                break
+            start, start_pieces, start_state = checkpoint_tick, pieces_drawn, state
+
+        if start:
+            game, clock = self._new_game(start_pieces)
+            decode_state(game, clock, start_state)
+        else:
+            game, clock = self._new_game()
+            game.start()
+        self._run(game, clock, start, tick)
+        return game
+
+    def play(self, renderer: Renderer | None = None) -> Game:
+        """Replay the whole game at maximum speed."""
+        game, clock = self._new_game()
+        game.start()
+        self._run(game, clock, 0, len(self.dts), renderer)
+        return game
+
+    def verify(self) -> bool:
+        """Replay the game and check it ends with the recorded score, lines and level."""
+        game = self.play()
+        return self.final == (game.score, game.cleared_lines, game.level)
+
+    def _run(self, game: Game, clock: ManualClock, start: int, stop: int, renderer: Renderer | None = None):
+        for dt_ticks, action in zip(self.dts[start:stop], self.actions[start:stop]):
+            dt = dt_ticks / TICKS_PER_SECOND
+            clock.advance(dt)
+            game.process(dt, Action(action) if action else None)
+            if renderer and game.is_running:
+                renderer.draw(game.snapshot)
@@ -0,0 +1,103 @@
+from collections.abc import Callable
+from dataclasses import dataclass
+from time import perf_counter, sleep
+
+
+@dataclass
+class FrameStats:
+    ticks: int = 0
+    frames: int = 0
+    skipped_frames: int = 0   # frame deadlines missed because rendering fell behind
+    dropped_ticks: int = 0    # simulation time given up to catch up
+    frame_time: float = 0.0   # moving average of render time
+    frame_time_max: float = 0.0
+    frame_interval: float = 0.0  # current (possibly adapted) frame cap
+
+    @property
+    def fps(self) -> float:
+        return 1 / self.frame_interval if self.frame_interval else 0.0
+
+
+class Scheduler:
+    """
+    Fixed-timestep game loop. `update(dt)` runs at exactly `tick_rate` ticks
+    per second of wall time with a constant dt, `render()` runs at most
+    `max_fps` times per second. When `adaptive`, the frame cap drops towards
+    `min_fps` if rendering cannot keep up and recovers once it can.
+    Between deadlines the loop sleeps instead of polling.
+    """
+    SPIN_MARGIN = 0.0005      # busy-wait the last bit of a sleep for precision
+    MAX_TICKS_PER_FRAME = 10  # catch-up limit before simulation time is dropped
+    FRAME_TIME_SMOOTHING = 0.1
+    ADAPTIVE_HEADROOM = 1.5   # frame interval kept above render time by this factor
+
+    def __init__(
+        self,
+        tick_rate: float = 100.0,
+        max_fps: float = 60.0,
+        min_fps: float = 10.0,
+        adaptive: bool = True,
+        clock: Callable[[], float] = perf_counter,
+    ):
+        self.tick_interval = 1 / tick_rate
+        self.min_frame_interval = 1 / max_fps
+        self.max_frame_interval = 1 / min_fps
+        self.adaptive = adaptive
+        self.clock = clock
+        self.stats = FrameStats(frame_interval=self.min_frame_interval)
+
+    def sleep_until(self, deadline: float):
+        remaining = deadline - self.clock()
+        if remaining > self.SPIN_MARGIN:
+            sleep(remaining - self.SPIN_MARGIN)
+        while self.clock() < deadline:
+            pass
+
+    def run(self, update: Callable[[float], bool], render: Callable[[], None]):
+        """Run until `update` returns False."""
+        stats = self.stats
+        now = self.clock()
+        next_tick = now + self.tick_interval
+        next_frame = now
+
+        while True:
+            now = self.clock()
+
+            ticks = 0
+            while next_tick <= now:
+                if not update(self.tick_interval):
+                    return
+                stats.ticks += 1
+                next_tick += self.tick_interval
+                ticks += 1
+                if ticks == self.MAX_TICKS_PER_FRAME and next_tick <= now:
+                    dropped = int((now - next_tick) / self.tick_interval) + 1
+                    stats.dropped_ticks += dropped
+                    next_tick += dropped * self.tick_interval
+                    break
+
+            if next_frame <= now:
+                started = self.clock()
+                render()
+                frame_time = self.clock() - started
+                self._record_frame(frame_time)
+
+                next_frame += stats.frame_interval
+                if next_frame <= self.clock():
+                    # rendering fell behind, skip the missed frames
+                    missed = int((self.clock() - next_frame) / stats.frame_interval) + 1
+                    stats.skipped_frames += missed
+                    next_frame += missed * stats.frame_interval
+
+            self.sleep_until(min(next_tick, next_frame))
+
+    def _record_frame(self, frame_time: float):
+        stats = self.stats
+        stats.frames += 1
+        stats.frame_time += (frame_time - stats.frame_time) * self.FRAME_TIME_SMOOTHING
+        stats.frame_time_max = max(stats.frame_time_max, frame_time)
+        if self.adaptive:
+            stats.frame_interval = min(
+                self.max_frame_interval,
+                max(self.min_frame_interval, stats.frame_time * self.ADAPTIVE_HEADROOM),
+            )
@@ -0,0 +1,176 @@
+import argparse
+import asyncio
+import sys
+import traceback
+
+from aio import StreamInput, run_session
+from pieces import bag_piece_generator
+from field import BitboardField
+from game import Game
+from renderer import DiffRenderer
+from output import is_backed_up
+
+# Telnet protocol bytes
+IAC = 0xFF
+SB = 0xFA
+SE = 0xF0
+WILL, WONT, DO, DONT = 0xFB, 0xFC, 0xFD, 0xFE
+ECHO = 0x01
+SUPPRESS_GO_AHEAD = 0x03
+
+# server echoes nothing and clients send every key right away (character mode)
+NEGOTIATION = bytes([IAC, WILL, ECHO, IAC, WILL, SUPPRESS_GO_AHEAD, IAC, DO, SUPPRESS_GO_AHEAD])
+
+
+class TelnetInput(StreamInput):
+    """`StreamInput` that strips telnet option negotiation from the key stream."""
+    def __init__(self, reader: asyncio.StreamReader):
+        super().__init__(reader)
+        self._state: int | tuple[int, int] | None = None  # None, IAC, an option verb, SB or (SB, IAC)
+
+    def feed(self, data: str):
+        keys = []
+        for ch in data:
+            byte = ord(ch)
+            state = self._state
+            if state is None:
+                if byte == IAC:
+                    self._state = IAC
+                else:
+                    keys.append(ch)
+            elif state == IAC:
+                if byte in (WILL, WONT, DO, DONT):
+                    self._state = byte
+                elif byte == SB:
+                    self._state = SB
+                else:
+                    if byte == IAC:
+                        keys.append(ch)  # escaped 0xFF
+                    self._state = None
+            elif state == SB:
+                if byte == IAC:
+                    self._state = (SB, IAC)
+            elif state == (SB, IAC):
+                self._state = None if byte == SE else SB
+            else:
+                self._state = None  # option byte after WILL/WONT/DO/DONT
+        if keys:
+            super().feed(''.join(keys))
+
+
+class ConnectionWriter:
+    """
+    Text stream for a `Renderer` that buffers a frame and hands it to the
+    connection on `flush()`. Frames are dropped rather than queued while the
+    client is slower than the game (back-pressure), `on_drop` is called so the
+    renderer repaints in full once the client catches up.
+    """
+    def __init__(self, writer: asyncio.StreamWriter, on_drop=None):
+        self.writer = writer
+        self.on_drop = on_drop
+        self.parts: list[str] = []
+        self.bytes_written = 0
+        self.dropped_frames = 0
+
+    def write(self, text: str) -> int:
+        self.parts.append(text)
+        return len(text)
+
+    def flush(self):
+        if not self.parts or self.writer.is_closing():
+            self.parts.clear()
+            return
+        if is_backed_up(self.writer):
+            self.parts.clear()
+            self.dropped_frames += 1
+            if self.on_drop:
+                self.on_drop()
+            return
+        data = ''.join(self.parts).replace('\n', '\r\n').encode()
+        self.parts.clear()
+        self.writer.write(data)
+        self.bytes_written += len(data)
+
+
+class Session:
+    """One connected player: own field, piece generator, input parser and renderer."""
+    GAME_OVER_LINGER = 2.0
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, width: int, height: int):
+        self.writer = writer
+        self.keys = TelnetInput(reader)
+        self.out = ConnectionWriter(writer)
+        self.renderer = DiffRenderer(width, height, out=self.out)
+        self.out.on_drop = self.renderer.invalidate
+        self.game = Game(BitboardField(width, height), bag_piece_generator)
+
+    async def run(self):
+        self.writer.write(NEGOTIATION)
+        self.game.start()
+        pump = asyncio.create_task(self.keys.pump())
+        play = asyncio.create_task(run_session(self.game, self.renderer, self.keys))
+        try:
+            await asyncio.wait([play, pump], return_when=asyncio.FIRST_COMPLETED)
+            if play.done() and not play.cancelled():
+                if error := play.exception():
+                    print(f"session {self.writer.get_extra_info('peername')} crashed:", file=sys.stderr)
+                    traceback.print_exception(error)
+                else:
+                    self.renderer.draw_message("GAME OVER")
+                    self.out.flush()
+                    await asyncio.sleep(self.GAME_OVER_LINGER)
+        finally:
+            play.cancel()
+            pump.cancel()
+            self.writer.close()
+
+
+class Server:
+    def __init__(self, width: int, height: int, max_sessions: int):
+        self.width = width
+        self.height = height
+        self.max_sessions = max_sessions
+        self.sessions: set[Session] = set()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        if len(self.sessions) >= self.max_sessions:
+            writer.write(b"Server full, try again later.\r\n")
+            writer.close()
+            return
+        session = Session(reader, writer, self.width, self.height)
+        self.sessions.add(session)
+        try:
+            await session.run()
+        except ConnectionError:
+            pass
+        finally:
+            self.sessions.discard(session)
+
+
+async def serve(args):
+    server = Server(args.width, args.height, args.max_sessions)
+    if args.unix:
+        listener = await asyncio.start_unix_server(server.handle, path=args.unix)
+    else:
+        listener = await asyncio.start_server(server.handle, args.host, args.port)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Serve Tetris to telnet clients, one game per connection.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=2323)
+    parser.add_argument('--unix', help="listen on a Unix socket at this path instead of TCP")
+    parser.add_argument('--width', type=int, default=10)
+    parser.add_argument('--height', type=int, default=20)
+    parser.add_argument('--max-sessions', type=int, default=500)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
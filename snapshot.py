@@ -1,17 +1,47 @@
 from dataclasses import dataclass
-from pieces import Piece
+from pieces import Piece, PieceType, Orientation, ORIENTATIONS
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class FieldSnapshot:
     width: int
     height: int
-    grid: list[list[int]]
+    grid: tuple[tuple[int, ...], ...]
+    version: int = 0
+    top: int = 0   # field row of grid[0], nonzero for a window of a larger field
+    left: int = 0  # field column of every row's first cell
 
-@dataclass
+@dataclass(frozen=True, slots=True)
+class PieceSnapshot:
+    kind: PieceType
+    rotation: int
+    x: int
+    y: int
+    
+    @classmethod
+    def of(cls, piece: Piece | None) -> 'PieceSnapshot | None':
+        return cls(piece.kind, piece.rotation, piece.x, piece.y) if piece else None
+    
+    @property
+    def orientation(self) -> Orientation:
+        return ORIENTATIONS[self.kind][self.rotation]
+    
+    @property
+    def shape(self) -> tuple[tuple[int, ...], ...]:
+        return self.orientation.shape
+    
+    @property
+    def width(self) -> int:
+        return self.orientation.width
+    
+    @property
+    def height(self) -> int:
+        return self.orientation.height
+
+@dataclass(frozen=True, slots=True)
 class GameSnapshot:
     field: FieldSnapshot
-    current_piece: Piece
-    next_piece: Piece
+    current_piece: PieceSnapshot | None
+    next_piece: PieceSnapshot | None
     ghost_y: int
     level: int
     score: int
@@ -0,0 +1,297 @@
+import argparse
+import asyncio
+import struct
+
+from pieces import PieceType
+from snapshot import GameSnapshot, FieldSnapshot, PieceSnapshot
+from renderer import Renderer, DiffRenderer
+from output import is_backed_up
+from replay import write_varint, read_varint, zigzag, unzigzag
+
+# Message tags, every message is framed by a little-endian u32 length
+KEYFRAME = 0x01   # varint seq, varint width, varint height, every row
+DELTA = 0x02      # varint seq, varint count, count x (varint y, row)
+GAME_OVER = 0x03  # varint seq
+# KEYFRAME and DELTA end with the pieces, ghost row, level, score and playtime (ms)
+
+NO_PIECE = 0
+_LENGTH = struct.Struct('<I')
+
+
+class DeltaEncoder:
+    """
+    Encodes consecutive snapshots of one game. Rows are compared by identity
+    first, snapshots share the row tuples that did not change, so finding the
+    changed rows costs one pointer comparison per row.
+    """
+    def __init__(self):
+        self.seq = 0
+        self.snapshot: GameSnapshot | None = None
+        self._rows: tuple[tuple[int, ...], ...] = ()
+
+    def delta(self, snapshot: GameSnapshot) -> bytes:
+        """Message with the changes since the previous snapshot (a keyframe for the first)."""
+        last_rows = self._rows
+        grid = snapshot.field.grid
+        if len(grid) != len(last_rows):
+            self.seq += 1
+            self._remember(snapshot)
+            return self.keyframe(snapshot)
+        changed = [
+            y for y, row in enumerate(grid)
+            if row is not last_rows[y] and row != last_rows[y]
+        ]
+        self.seq += 1
+        buf = bytearray(_LENGTH.size)
+        buf.append(DELTA)
+        write_varint(buf, self.seq)
+        write_varint(buf, len(changed))
+        for y in changed:
+            write_varint(buf, y)
+            buf.extend(grid[y])
+        self._write_tail(buf, snapshot)
+        self._remember(snapshot)
+        return self._framed(buf)
+
+    def keyframe(self, snapshot: GameSnapshot) -> bytes:
+        """Message with the whole of `snapshot`, the last one given to `delta()`, under its sequence number."""
+        field = snapshot.field
+        buf = bytearray(_LENGTH.size)
+        buf.append(KEYFRAME)
+        write_varint(buf, self.seq)
+        write_varint(buf, field.width)
+        write_varint(buf, field.height)
+        for row in field.grid:
+            buf.extend(row)
+        self._write_tail(buf, snapshot)
+        return self._framed(buf)
+
+    def game_over(self) -> bytes:
+        buf = bytearray(_LENGTH.size)
+        buf.append(GAME_OVER)
+        write_varint(buf, self.seq)
+        return self._framed(buf)
+
+    def _remember(self, snapshot: GameSnapshot):
+        self.snapshot = snapshot
+        self._rows = snapshot.field.grid
+
+    @staticmethod
+    def _write_tail(buf: bytearray, snapshot: GameSnapshot):
+        piece = snapshot.current_piece
+        buf.append(piece.kind.value if piece else NO_PIECE)
+        buf.append(piece.rotation if piece else 0)
+        write_varint(buf, zigzag(piece.x if piece else 0))
+        write_varint(buf, zigzag(piece.y if piece else 0))
+        buf.append(snapshot.next_piece.kind.value if snapshot.next_piece else NO_PIECE)
+        write_varint(buf, zigzag(snapshot.ghost_y))
+        write_varint(buf, snapshot.level)
+        write_varint(buf, snapshot.score)
+        write_varint(buf, round(snapshot.playtime * 1000))
+
+    @staticmethod
+    def _framed(buf: bytearray) -> bytes:
+        _LENGTH.pack_into(buf, 0, len(buf) - _LENGTH.size)
+        return bytes(buf)
+
+
+class DeltaDecoder:
+    """
+    Rebuilds snapshots from the messages of a `DeltaEncoder`. Until the first
+    keyframe, and after a gap in the sequence, deltas are ignored. Unchanged
+    rows keep their tuple, so a `Renderer` only re-renders the changed ones.
+    """
+    def __init__(self):
+        self.seq = 0
+        self.synced = False
+        self.game_over = False
+        self.width = self.height = 0
+        self._rows: list[tuple[int, ...]] = []
+        self._version = 0
+
+    def decode(self, message: bytes) -> GameSnapshot | None:
+        """Snapshot carried by one unframed message, None if it cannot be applied."""
+        tag = message[0]
+        seq, pos = read_varint(message, 1)
+        if tag == GAME_OVER:
+            self.game_over = True
+            return None
+        if tag == KEYFRAME:
+            self.width, pos = read_varint(message, pos)
+            self.height, pos = read_varint(message, pos)
+            width = self.width
+            self._rows = [tuple(message[pos + y * width:pos + (y + 1) * width]) for y in range(self.height)]
+            pos += width * self.height
+            self.synced = True
+        elif tag == DELTA:
+            if not self.synced or seq != self.seq + 1:
+                self.synced = False
+                return None
+            count, pos = read_varint(message, pos)
+            width = self.width
+            for _ in range(count):
+                y, pos = read_varint(message, pos)
+                self._rows[y] = tuple(message[pos:pos + width])
+                pos += width
+        else:
+            raise ValueError(f"unknown spectator message {tag:#x}")
+        self.seq = seq
+        self._version += 1
+        return self._read_tail(message, pos)
+
+    def _read_tail(self, message: bytes, pos: int) -> GameSnapshot:
+        kind, rotation = message[pos], message[pos + 1]
+        x, pos = read_varint(message, pos + 2)
+        y, pos = read_varint(message, pos)
+        next_kind = message[pos]
+        ghost_y, pos = read_varint(message, pos + 1)
+        level, pos = read_varint(message, pos)
+        score, pos = read_varint(message, pos)
+        playtime, pos = read_varint(message, pos)
+        return GameSnapshot(
+            field=FieldSnapshot(self.width, self.height, tuple(self._rows), self._version),
+            current_piece=PieceSnapshot(PieceType(kind), rotation, unzigzag(x), unzigzag(y)) if kind else None,
+            next_piece=PieceSnapshot(PieceType(next_kind), 0, 0, 0) if next_kind else None,
+            ghost_y=unzigzag(ghost_y),
+            level=level,
+            score=score,
+            playtime=playtime / 1000,
+        )
+
+
+class _Watcher:
+    __slots__ = ('writer', 'synced')
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.synced = False
+
+
+class SpectatorFeed:
+    """
+    Publishes one game to any number of watchers. Each snapshot is encoded
+    once, as a delta, and the same bytes are written to every watcher. A
+    keyframe goes to everyone every `keyframe_every` frames, and is encoded
+    (once) in between for watchers that joined late or had frames dropped.
+    Watchers slower than the game lose frames (back-pressure) and resync
+    on the next keyframe they are sent.
+    """
+    def __init__(self, keyframe_every: int = 100):
+        self.keyframe_every = keyframe_every
+        self.encoder = DeltaEncoder()
+        self.watchers: list[_Watcher] = []
+        self.bytes_encoded = 0
+        self.dropped_frames = 0
+
+    def add(self, writer: asyncio.StreamWriter):
+        self.watchers.append(_Watcher(writer))
+
+    def remove(self, writer: asyncio.StreamWriter):
+        self.watchers = [watcher for watcher in self.watchers if watcher.writer is not writer]
+
+    def publish(self, snapshot: GameSnapshot):
+        encoder = self.encoder
+        delta = encoder.delta(snapshot)
+        keyframe = None
+        periodic = encoder.seq % self.keyframe_every == 1
+        closed = False
+        for watcher in self.watchers:
+            writer = watcher.writer
+            if writer.is_closing():
+                closed = True
+                continue
+            if is_backed_up(writer):
+                watcher.synced = False
+                self.dropped_frames += 1
+                continue
+            if periodic or not watcher.synced:
+                if keyframe is None:
+                    keyframe = encoder.keyframe(snapshot)
+                    self.bytes_encoded += len(keyframe)
+                writer.write(keyframe)
+                watcher.synced = True
+            else:
+                writer.write(delta)
+        self.bytes_encoded += len(delta)
+        if closed:
+            self.watchers = [watcher for watcher in self.watchers if not watcher.writer.is_closing()]
+
+    def end(self):
+        """Tell every watcher the game is over."""
+        message = self.encoder.game_over()
+        for watcher in self.watchers:
+            if not watcher.writer.is_closing():
+                watcher.writer.write(message)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Connection handler for `asyncio.start_server`: watch until the client disconnects."""
+        self.add(writer)
+        try:
+            while await reader.read(1024):
+                pass  # watchers have nothing to say
+        except ConnectionError:
+            pass
+        finally:
+            self.remove(writer)
+            writer.close()
+
+
+async def serve_feed(feed: SpectatorFeed, host: str = '127.0.0.1', port: int | None = None, unix: str | None = None):
+    """Start accepting watchers on a Unix socket or TCP port, return the server."""
+    if unix:
+        return await asyncio.start_unix_server(feed.handle, path=unix)
+    return await asyncio.start_server(feed.handle, host, port)
+
+
+async def read_messages(reader: asyncio.StreamReader):
+    """Yield the unframed messages of a feed until it closes."""
+    while True:
+        try:
+            header = await reader.readexactly(_LENGTH.size)
+            yield await reader.readexactly(_LENGTH.unpack(header)[0])
+        except asyncio.IncompleteReadError:
+            return
+
+
+async def watch(reader: asyncio.StreamReader, renderer_class: type[Renderer] = DiffRenderer):
+    """Draw the game of a feed until it ends or disconnects."""
+    decoder = DeltaDecoder()
+    renderer = None
+    async for message in read_messages(reader):
+        snapshot = decoder.decode(message)
+        if decoder.game_over:
+            break
+        if snapshot is None:
+            continue
+        if renderer is None or (renderer.width, renderer.height) != (decoder.width, decoder.height):
+            renderer = renderer_class(decoder.width, decoder.height)
+        renderer.draw(snapshot)
+    if renderer:
+        renderer.draw_message("GAME OVER" if decoder.game_over else "DISCONNECTED")
+
+
+async def connect(args):
+    if args.unix:
+        reader, writer = await asyncio.open_unix_connection(args.unix)
+    else:
+        reader, writer = await asyncio.open_connection(args.host, args.port)
+    try:
+        await watch(reader)
+    finally:
+        writer.close()
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Watch a game published by a spectator feed.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=2324)
+    parser.add_argument('--unix', help="connect to a Unix socket at this path instead of TCP")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(connect(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+import struct
+from collections.abc import Callable, Iterator
+from time import perf_counter
+
+from pieces import Piece, PieceType, PieceGenerator, RandomPieceGenerator, BagPieceGenerator
+from field import BaseField, BitboardField
+from game import Game
+from replay import write_varint, read_varint, zigzag, unzigzag, write_game, read_game
+
+MAGIC = b'TSAV'
+VERSION = 2  # 2: signed generator seeds
+
+# Piece generator tags
+NO_GENERATOR = 0    # not serializable, the loader must be given one
+RANDOM_GENERATOR = 1
+BAG_GENERATOR = 2
+GENERATOR_TAGS = {RandomPieceGenerator: RANDOM_GENERATOR, BagPieceGenerator: BAG_GENERATOR}
+GENERATOR_CLASSES = {tag: cls for cls, tag in GENERATOR_TAGS.items()}
+
+NO_GAUSS = 0
+_FLOATS = struct.Struct('<3d')
+_DOUBLE = struct.Struct('<d')
+_MT_STATE = struct.Struct('<625I')  # Mersenne Twister words + position
+
+
+def save_game(game: Game) -> bytes:
+    """
+    Pack the complete state of `game` into a compact blob: field, pieces,
+    counters, state timers, physics accumulator and piece generator.
+    Times are stored relative to the game clock, so a game loaded under a
+    different clock continues where it left off.
+    """
+    buf = bytearray(MAGIC)
+    buf.append(VERSION)
+    write_varint(buf, game.field.width)
+    write_varint(buf, game.field.height)
+    write_game(buf, game)
+    now = game.clock()
+    timer_left = game._next_state_timer - now if game._next_state_timer else 0.0
+    buf.extend(_FLOATS.pack(timer_left, game._physics_acc, game.playtime))
+
+    _write_generator(buf, game.piece_gen)
+    return bytes(buf)
+
+
+def load_game(
+    blob: bytes,
+    field_factory: Callable[[int, int], BaseField] = BitboardField,
+    clock: Callable[[], float] = perf_counter,
+    piece_generator: Callable[[], Iterator[Piece]] | None = None,
+    game_class: type[Game] = Game,
+) -> Game:
+    """
+    Rebuild a game saved by `save_game`. `piece_generator` is only needed
+    when the saved game used a generator that cannot be serialized.
+    """
+    if blob[:4] != MAGIC or blob[4] != VERSION:
+        raise ValueError("not a saved game")
+    width, pos = read_varint(blob, 5)
+    height, pos = read_varint(blob, pos)
+    # the generator is stored last, it replaces this placeholder once read
+    game = game_class(field_factory(width, height), lambda: iter(()), clock=clock)
+    pos = read_game(game, blob, pos)
+    timer_left, physics_acc, playtime = _FLOATS.unpack_from(blob, pos)
+    pos += _FLOATS.size
+
+    generator, pos = _read_generator(blob, pos)
+    if generator is None:
+        if piece_generator is None:
+            raise ValueError("saved game has no piece generator state, pass piece_generator")
+        game.piece_gen = piece_generator()
+    else:
+        game.piece_gen = generator
+
+    now = clock()
+    game._next_state_timer = now + timer_left if timer_left else 0.0
+    game._physics_acc = physics_acc
+    game.game_started_at = now - playtime
+    return game
+
+
+def _write_generator(buf: bytearray, piece_gen):
+    tag = GENERATOR_TAGS.get(type(piece_gen), NO_GENERATOR)
+    buf.append(tag)
+    if tag == NO_GENERATOR:
+        return
+    state = piece_gen.getstate()
+    (rng_version, words, gauss), index, queue = state[:3]
+    seed = piece_gen.seed
+    write_varint(buf, zigzag(seed) + 1 if seed is not None else 0)
+    write_varint(buf, index)
+    write_varint(buf, len(queue))
+    buf.extend(kind.value for kind in queue)
+    buf.append(rng_version)
+    buf.extend(_MT_STATE.pack(*words))
+    if gauss is None:
+        buf.append(NO_GAUSS)
+    else:
+        buf.append(1)
+        buf.extend(_DOUBLE.pack(gauss))
+    if tag == BAG_GENERATOR:
+        bag, bag_pos = state[3:]
+        write_varint(buf, len(bag))
+        buf.extend(kind.value for kind in bag)
+        write_varint(buf, bag_pos)
+
+
+def _read_generator(blob: bytes, pos: int) -> tuple[PieceGenerator | None, int]:
+    tag = blob[pos]
+    pos += 1
+    if tag == NO_GENERATOR:
+        return None, pos
+    seed, pos = read_varint(blob, pos)
+    index, pos = read_varint(blob, pos)
+    size, pos = read_varint(blob, pos)
+    queue = tuple(PieceType(kind) for kind in blob[pos:pos + size])
+    pos += size
+    rng_version = blob[pos]
+    words = _MT_STATE.unpack_from(blob, pos + 1)
+    pos += 1 + _MT_STATE.size
+    gauss = None
+    if blob[pos] != NO_GAUSS:
+        gauss = _DOUBLE.unpack_from(blob, pos + 1)[0]
+        pos += _DOUBLE.size
+    pos += 1
+    state: tuple = ((rng_version, words, gauss), index, queue)
+    if tag == BAG_GENERATOR:
+        size, pos = read_varint(blob, pos)
+        bag = tuple(PieceType(kind) for kind in blob[pos:pos + size])
+        bag_pos, pos = read_varint(blob, pos + size)
+        state = (*state, bag, bag_pos)
+
+    # seeded generators keep their start state, so seek() can still rewind
+    generator = GENERATOR_CLASSES[tag](unzigzag(seed - 1) if seed else None)
+    generator.setstate(state)
+    return generator, pos
@@ -0,0 +1,131 @@
+import argparse
+import json
+import random
+import sys
+from functools import partial
+from time import perf_counter
+
+from input import Action
+from output import NullWriter
+from pieces import Piece, PieceType, bag_piece_generator
+from field import Field, BitboardField, SparseField
+from game import Game
+from headless import Simulation
+from renderer import Renderer
+from profiler import Histogram
+
+FIELDS = {'sparse': SparseField, 'bitboard': BitboardField, 'list': Field}
+GAP_COLUMN = 0
+
+
+class StressPolicy:
+    """
+    Drops I pieces upright into the gap column of the prefilled rows, so they
+    keep clearing lines, and every other piece at a random column.
+    """
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+        self._plan: list[Action] = []
+        self._planned_for: Piece | None = None
+
+    def get_action(self, game: Game) -> Action | None:
+        if not game.is_running or not game.current_piece:
+            return None
+        if game.next_piece is not self._planned_for:
+            self._planned_for = game.next_piece
+            width = game.field.width
+            if game.current_piece.kind == PieceType.I:
+                rotations, shift = 1, -width
+            else:
+                rotations, shift = self.rng.randrange(4), self.rng.randrange(-width // 2, width // 2)
+            move = Action.MOVE_LEFT if shift < 0 else Action.MOVE_RIGHT
+            self._plan = [Action.ROTATE] * rotations + [move] * abs(shift) + [Action.HARD_DROP]
+            self._plan.reverse()
+        return self._plan.pop() if self._plan else None
+
+
+def prefilled_grid(width: int, height: int, rows: int, rng: random.Random) -> list[list[int]]:
+    """`rows` bottom rows filled except for the gap column."""
+    empty = [0] * width
+    grid = [empty] * (height - rows)
+    for _ in range(rows):
+        row = [rng.randint(1, len(PieceType)) for _ in range(width)]
+        row[GAP_COLUMN] = 0
+        grid.append(row)
+    return grid
+
+
+def run(args) -> dict:
+    rng = random.Random(args.seed)
+    field = FIELDS[args.field](args.width, args.height)
+    fill_rows = int(args.height * args.fill)
+    started = perf_counter()
+    field.load(prefilled_grid(args.width, args.height, fill_rows, rng))
+    setup = perf_counter() - started
+
+    simulation = Simulation(field, partial(bag_piece_generator, args.seed))
+    game = simulation.game
+    policy = StressPolicy(args.seed)
+    renderer = None
+    if args.render != 'none':
+        out = sys.stdout if args.render == 'terminal' else NullWriter()
+        renderer = Renderer(min(args.view_cols, args.width), min(args.view_rows, args.height), out=out)
+
+    ticks, frames = Histogram(), Histogram()
+    simulation.start()
+    while simulation.ticks < args.ticks:
+        action = policy.get_action(game)
+        started = perf_counter()
+        running = simulation.step(action)
+        ticks.add(perf_counter() - started)
+        if renderer:
+            started = perf_counter()
+            renderer.draw(game.viewport(args.view_rows, args.view_cols))
+            frames.add(perf_counter() - started)
+        if not running:
+            break
+
+    us = lambda seconds: round(seconds * 1e6, 1)
+    result = {
+        'field': args.field,
+        'width': args.width,
+        'height': args.height,
+        'prefilled_rows': fill_rows,
+        'setup_ms': round(setup * 1e3, 1),
+        'ticks': simulation.ticks,
+        'pieces': game.pieces_placed,
+        'lines': game.cleared_lines,
+        'game_over': game.is_game_over,
+        'tick_us': {'mean': us(ticks.mean), 'p50': us(ticks.percentile(50)), 'p99': us(ticks.percentile(99)), 'max': us(ticks.max)},
+    }
+    if renderer:
+        result['frame_us'] = {'mean': us(frames.mean), 'p99': us(frames.percentile(99)), 'max': us(frames.max)}
+    return result
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Stress the engine with a large board and report the cost per tick.")
+    parser.add_argument('--width', type=int, default=200)
+    parser.add_argument('--height', type=int, default=5000)
+    parser.add_argument('--field', choices=FIELDS, default='sparse')
+    parser.add_argument('--fill', type=float, default=0.5, help="fraction of the rows prefilled (one gap each)")
+    parser.add_argument('--ticks', type=int, default=20_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--render', choices=('none', 'null', 'terminal'), default='null',
+                        help="draw a viewport every tick, to a null stream or the terminal")
+    parser.add_argument('--view-rows', type=int, default=30)
+    parser.add_argument('--view-cols', type=int, default=80)
+    parser.add_argument('-o', '--output', help="write the result as JSON to this file")
+    args = parser.parse_args(argv)
+
+    result = run(args)
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    if args.render != 'terminal' or args.output is None:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,39 +1,41 @@
-from time import sleep, perf_counter
-
 from pieces import bag_piece_generator
 from input import Input
-from field import Field
+from field import BitboardField
 from game import Game
-from renderer import Renderer
+from renderer import DiffRenderer
+from animation import GameAnimator
+from scheduler import Scheduler
+from profiler import profiler_from_env
 
 GAME_FIELD_WIDTH = 10
 GAME_FIELD_HEIGHT = 20
-REFRESH_RATE = 0.01
+TICK_RATE = 100  # simulation ticks per second
+MAX_FPS = 60
 
 key_reader = Input()
-game_field = Field(GAME_FIELD_WIDTH, GAME_FIELD_HEIGHT)
+game_field = BitboardField(GAME_FIELD_WIDTH, GAME_FIELD_HEIGHT)
 game = Game(game_field, bag_piece_generator)
-renderer = Renderer(GAME_FIELD_WIDTH, GAME_FIELD_HEIGHT)
+renderer = DiffRenderer(GAME_FIELD_WIDTH, GAME_FIELD_HEIGHT)
+scheduler = Scheduler(TICK_RATE, MAX_FPS)
+profiler = profiler_from_env()  # opt-in via TETRIS_PROFILE
+profiler.attach(game=game, key_reader=key_reader, renderer=renderer, scheduler=scheduler)
+animator = GameAnimator(game, renderer)
 game.start()
 
-last = perf_counter()
 
-while True:
-    now = perf_counter()
-    delta = now - last
-    last = now
-    
+def update(dt: float) -> bool:
     action = key_reader.get_action()
-    game.process(delta, action)
-    
-    if game.is_running:
-        renderer.draw(game.snapshot)
-    elif game.is_leveling_up:
-        renderer.draw_message(f"LEVEL {game.level}!")
-    elif game.is_game_over:
-        renderer.draw_game_over(game.snapshot)
-        break
-    sleep(REFRESH_RATE)
+    if not game.is_game_over:
+        game.process(dt, action)
+    return not animator.finished
+
 
+def render():
+    animator.draw()
+    profiler.end_frame()
 
 
+try:
+    scheduler.run(update, render)
+finally:
+    profiler.dump()
@@ -0,0 +1,178 @@
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field as dataclass_field
+from functools import partial
+from typing import Protocol
+
+from input import Action
+from pieces import random_piece_generator, bag_piece_generator
+from field import BitboardField
+from game import Game
+from headless import Simulation, DEFAULT_TICK
+from ai import Bot, PlacementSearch, MonteCarloSearch
+from replay import Recorder
+from archive import ArchiveWriter
+
+GENERATORS = {
+    'bag': bag_piece_generator,
+    'random': random_piece_generator,
+}
+
+RESULT_FIELDS = ['seed', 'score', 'lines', 'level', 'pieces', 'ticks', 'seconds', 'game_over']
+
+
+class Policy(Protocol):
+    """Picks the key to press on every tick."""
+    def get_action(self, game: Game) -> Action | None: ...
+
+
+class RandomPolicy:
+    """Presses a random key (or nothing) every tick."""
+    CHOICES = [None, None, None, *Action]
+
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+
+    def get_action(self, game: Game) -> Action | None:
+        return self.rng.choice(self.CHOICES)
+
+
+POLICIES: dict[str, Callable[['TournamentConfig', int], Policy]] = {
+    'random': lambda config, seed: RandomPolicy(seed),
+    'greedy': lambda config, seed: Bot(PlacementSearch(config.width, config.height, lookahead=False)),
+    'lookahead': lambda config, seed: Bot(PlacementSearch(
+        config.width, config.height, lookahead=True, time_budget=config.time_budget,
+    )),
+    # rollouts run inline, the tournament already spreads games over the pool
+    'montecarlo': lambda config, seed: Bot(MonteCarloSearch(
+        config.width, config.height, time_budget=config.time_budget, workers=0, seed=seed,
+    )),
+}
+
+
+@dataclass(frozen=True)
+class TournamentConfig:
+    policy: str = 'greedy'
+    generator: str = 'bag'
+    width: int = 10
+    height: int = 20
+    max_ticks: int = 100_000
+    time_budget: float = 0.05
+    rules: dict[str, float] = dataclass_field(default_factory=dict)  # Game class attribute overrides
+    record: bool = False  # add the game's replay to the result row, under 'replay'
+
+
+def play_game(config: TournamentConfig, seed: int) -> dict:
+    """Play one seeded headless game and return its summary row."""
+    game_class = type('TournamentGame', (Game,), dict(config.rules)) if config.rules else Game
+    simulation = Simulation(
+        BitboardField(config.width, config.height),
+        partial(GENERATORS[config.generator], seed),
+        game_class=game_class,
+    )
+    policy = POLICIES[config.policy](config, seed)
+    game = simulation.game
+    recorder = Recorder(game, seed) if config.record else None
+
+    simulation.start()
+    while simulation.ticks < config.max_ticks and simulation.step(policy.get_action(game)):
+        pass
+
+    row: dict[str, int | float | bool | bytes] = {
+        'seed': seed,
+        'score': game.score,
+        'lines': game.cleared_lines,
+        'level': game.level,
+        'pieces': game.pieces_placed,
+        'ticks': simulation.ticks,
+        'seconds': round(simulation.ticks * DEFAULT_TICK, 2),
+        'game_over': game.is_game_over,
+    }
+    if recorder:
+        row['replay'] = recorder.to_bytes()
+    return row
+
+
+def run_tournament(config: TournamentConfig, seeds: range, workers: int | None = None, chunksize: int = 16):
+    """Yield result rows in seed order as the worker pool finishes them."""
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(partial(play_game, config), seeds, chunksize=chunksize)
+
+
+def parse_rule(text: str) -> tuple[str, float]:
+    name, _, value = text.partition('=')
+    if name.upper() != name or not isinstance(getattr(Game, name, None), (int, float)):
+        raise argparse.ArgumentTypeError(f"unknown rule {name!r}")
+    return name, type(getattr(Game, name))(value)
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Play many seeded headless games in parallel.")
+    parser.add_argument('-n', '--games', type=int, default=1000)
+    parser.add_argument('--first-seed', type=int, default=0)
+    parser.add_argument('--policy', choices=POLICIES, default='greedy')
+    parser.add_argument('--generator', choices=GENERATORS, default='bag')
+    parser.add_argument('--width', type=int, default=10)
+    parser.add_argument('--height', type=int, default=20)
+    parser.add_argument('--max-ticks', type=int, default=100_000)
+    parser.add_argument('--time-budget', type=float, default=0.05, help="seconds per decision for search policies")
+    parser.add_argument('--rule', type=parse_rule, action='append', default=[],
+                        help="override a Game rule, e.g. LEVEL_UP_EVERY_X_LINES=10 or GRAVITY_STEP=0.01")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunksize', type=int, default=16)
+    parser.add_argument('-o', '--output', help="results file, .csv or .jsonl (default: CSV to stdout)")
+    parser.add_argument('--archive', help="also record every game into this archive (see archive.py)")
+    args = parser.parse_args(argv)
+    if args.archive and args.rule:
+        parser.error("--archive replays with the default rules, it cannot be combined with --rule")
+
+    config = TournamentConfig(
+        policy = args.policy,
+        generator = args.generator,
+        width = args.width,
+        height = args.height,
+        max_ticks = args.max_ticks,
+        time_budget = args.time_budget,
+        rules = dict(args.rule),
+        record = bool(args.archive),
+    )
+    seeds = range(args.first_seed, args.first_seed + args.games)
+
+    out = open(args.output, 'w', newline='') if args.output else sys.stdout
+    jsonl = bool(args.output) and args.output.endswith('.jsonl')
+    writer = None if jsonl else csv.DictWriter(out, fieldnames=RESULT_FIELDS)
+    if writer:
+        writer.writeheader()
+
+    archive = ArchiveWriter(args.archive) if args.archive else None
+    total_score = total_lines = played = 0
+    try:
+        for row in run_tournament(config, seeds, args.workers, args.chunksize):
+            if archive:
+                archive.add(row.pop('replay'))
+            if writer is None:
+                out.write(json.dumps(row) + '\n')
+            else:
+                writer.writerow(row)
+            out.flush()
+            played += 1
+            total_score += row['score']
+            total_lines += row['lines']
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if archive:
+            archive.close()
+
+    if played:
+        print(f"{played} games, mean score {total_score / played:.1f}, mean lines {total_lines / played:.1f}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
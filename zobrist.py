@@ -0,0 +1,55 @@
+from functools import lru_cache
+
+from pieces import Piece
+
+MASK64 = (1 << 64) - 1
+_GOLDEN = 0x9E3779B97F4A7C15
+
+
+def mix64(z: int) -> int:
+    """SplitMix64 finalizer: scrambles a 64-bit value into a well distributed one."""
+    z = (z + _GOLDEN) & MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+
+@lru_cache(maxsize=1 << 16)
+def row_key(mask: int, y: int) -> int:
+    """
+    64-bit key of row `y` holding occupancy bitmask `mask`. Empty rows are 0,
+    so a board key is the XOR of its non-empty rows only.
+    """
+    if not mask:
+        return 0
+    z = mix64(y)
+    while True:  # rows wider than 64 columns are folded in 64-bit chunks
+        z = mix64(z ^ (mask & MASK64))
+        mask >>= 64
+        if not mask:
+            return z
+
+
+def board_key(rows) -> int:
+    """Key of a whole board given as row bitmasks, top row first."""
+    key = 0
+    for y, mask in enumerate(rows):
+        if mask:
+            key ^= row_key(mask, y)
+    return key
+
+
+def combine(key: int, *values: int) -> int:
+    """Fold small integers (piece ids, rotations, signed coordinates) into `key`."""
+    for value in values:
+        key = mix64(key ^ (value & MASK64))
+    return key
+
+
+def position_key(board: int, piece: Piece | None, next_piece: Piece | None) -> int:
+    """Key of a board key plus the current piece (kind, rotation, position) and the next kind."""
+    if piece is None:
+        key = combine(board, 0)
+    else:
+        key = combine(board, piece.kind.value, piece.rotation, piece.x, piece.y)
+    return combine(key, next_piece.kind.value if next_piece else 0)